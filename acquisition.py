@@ -0,0 +1,203 @@
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+# recorder class in recorders.py and the method that records until stop()
+RECORDERS = {'video': ('VideoRecorder', 'record_video'), 'ppg': ('PPGRecorder', 'start')}
+
+
+class AcquisitionError(RuntimeError):
+    pass
+
+
+def run_worker(kind, options, heartbeat_interval=1.0):
+    """
+    Recorder process: creates the recorder (and with it its LSL outlet), opens
+    its device, says ready, and records until "stop" arrives on stdin or stdin
+    closes because the experiment process is gone. stdout carries one message per
+    line, "ready", "heartbeat <stats>" every heartbeat_interval seconds and
+    "stopped <stats>", or "error <message>" if the recorder cannot be created or
+    its device opened; the recorder's own messages go to stderr.
+    """
+    protocol = sys.stdout
+    sys.stdout = sys.stderr
+
+    def send(message, stats=None):
+        try:
+            protocol.write(message if stats is None else f"{message} {json.dumps(stats)}")
+            protocol.write("\n")
+            protocol.flush()
+        except OSError:
+            pass  # nobody is listening any more, keep recording until stdin closes
+
+    import recorders
+    class_name, method = RECORDERS[kind]
+    try:
+        recorder = getattr(recorders, class_name)(**options)
+        recorder.open()
+    except Exception as e:
+        send("error", f"{type(e).__name__}: {e}")
+        raise
+
+    def read_commands():
+        for line in sys.stdin:
+            if line.strip() == "stop":
+                break
+        recorder.stop()
+
+    thread = threading.Thread(target=getattr(recorder, method))
+    thread.start()
+    threading.Thread(target=read_commands, daemon=True).start()
+    send("ready")
+    while thread.is_alive():
+        thread.join(heartbeat_interval)
+        send("heartbeat", recorder.stats())
+    send("stopped", recorder.stats())
+
+
+class RecorderProcess:
+    """One recorder of recorders.py running in its own interpreter, see run_worker"""
+
+    def __init__(self, name, kind, options, heartbeat_interval=1.0):
+        self.name = name
+        self.kind = kind
+        self.options = options
+        self.heartbeat_interval = heartbeat_interval
+        self.process = None
+        self.stats = {}
+        self.error = None
+        self.last_heartbeat = None
+        self.ready = threading.Event()
+        self.exited = threading.Event()
+
+    def start(self):
+        # a fresh interpreter rather than multiprocessing, which would re-import the
+        # calling experiment script (and open its LSL outlets again) in the child
+        self.process = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), self.kind, json.dumps(self.options),
+             str(self.heartbeat_interval)],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True, bufsize=1)
+        self.last_heartbeat = time.monotonic()
+        threading.Thread(target=self.read_messages, daemon=True).start()
+
+    def read_messages(self):
+        for line in self.process.stdout:
+            message, _, payload = line.strip().partition(" ")
+            self.last_heartbeat = time.monotonic()
+            if message == "error":
+                self.error = json.loads(payload)
+            elif payload:
+                self.stats = json.loads(payload)
+            if message == "ready":
+                self.ready.set()
+        self.exited.set()
+
+    def wait_ready(self, timeout):
+        deadline = time.monotonic() + timeout
+        while not self.ready.wait(0.1):
+            if self.exited.is_set():
+                if self.error:
+                    raise AcquisitionError(f"{self.name} recorder failed to start: {self.error}")
+                raise AcquisitionError(f"{self.name} recorder exited before it was ready, see its output above")
+            if time.monotonic() > deadline:
+                raise AcquisitionError(f"{self.name} recorder did not start within {timeout:g} s")
+
+    def healthy(self, timeout):
+        """Still running and sent a heartbeat within timeout seconds"""
+        return not self.exited.is_set() and time.monotonic() - self.last_heartbeat < timeout
+
+    def request_stop(self):
+        if self.process is None:
+            return
+        try:
+            self.process.stdin.write("stop\n")
+            self.process.stdin.close()
+        except OSError:
+            pass
+
+    def wait(self, timeout=30.0):
+        """Wait for the recorder to finish, killing it after timeout seconds. Returns its last stats"""
+        if self.process is None:
+            return self.stats
+        try:
+            self.process.wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            print(f"{self.name} recorder did not stop within {timeout:g} s, killing it")
+            self.process.kill()
+            self.process.wait()
+        self.exited.wait(timeout=1.0)
+        self.process = None
+        return self.stats
+
+
+class AcquisitionManager:
+    """
+    Runs the video and PPG recorders in their own processes, so capture, encoding
+    and serial parsing never compete with the PsychoPy frame loop for the GIL.
+    start() returns once every recorder has created its LSL stream, so LabRecorder
+    finds them; a recorder that stops sending heartbeats is reported while the
+    session runs. Recorders also stop, and close their files, if the experiment
+    process dies without calling stop().
+
+        acquisition = AcquisitionManager()
+        acquisition.add('video', 'video', cam_id=0, output_path=video_path, enable_lsl=True)
+        acquisition.add('ppg', 'ppg', port="COM4", enable_lsl=True)
+        acquisition.start()
+        ...
+        acquisition.stop()
+    """
+
+    def __init__(self, heartbeat_interval=1.0, heartbeat_timeout=5.0):
+        self.heartbeat_interval = heartbeat_interval
+        self.heartbeat_timeout = heartbeat_timeout
+        self.recorders = []
+        self.stop_event = threading.Event()
+        self.monitor_thread = None
+
+    def add(self, name, kind, **options):
+        """kind is 'video' (recorders.VideoRecorder) or 'ppg' (recorders.PPGRecorder), options its arguments"""
+        if kind not in RECORDERS:
+            raise ValueError(f"unknown recorder {kind}, expected one of {', '.join(RECORDERS)}")
+        self.recorders.append(RecorderProcess(name, kind, options, self.heartbeat_interval))
+
+    def start(self, timeout=30.0):
+        for recorder in self.recorders:
+            recorder.start()
+        try:
+            for recorder in self.recorders:
+                recorder.wait_ready(timeout)
+        except AcquisitionError:
+            self.stop()
+            raise
+        self.monitor_thread = threading.Thread(target=self.monitor, daemon=True)
+        self.monitor_thread.start()
+
+    def monitor(self):
+        reported = set()
+        while not self.stop_event.wait(self.heartbeat_interval):
+            for recorder in self.recorders:
+                if recorder.healthy(self.heartbeat_timeout):
+                    reported.discard(recorder.name)
+                elif recorder.name not in reported:
+                    reported.add(recorder.name)
+                    state = "stopped" if recorder.exited.is_set() else "stopped responding"
+                    print(f"WARNING: {recorder.name} recorder {state}, last stats {recorder.stats}")
+
+    def stop(self):
+        self.stop_event.set()
+        if self.monitor_thread:
+            self.monitor_thread.join()
+            self.monitor_thread = None
+        # all recorders finish their files at the same time
+        for recorder in self.recorders:
+            recorder.request_stop()
+        for recorder in self.recorders:
+            print(f"{recorder.name} recorder stopped: {recorder.wait()}")
+
+if __name__ == "__main__":
+    # recorder process started by RecorderProcess.start
+    kind, options, heartbeat_interval = sys.argv[1:4]
+    run_worker(kind, json.loads(options), float(heartbeat_interval))
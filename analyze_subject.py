@@ -7,89 +7,158 @@ from mne_icalabel import label_components
 from mne.preprocessing import ICA
 import numpy as np
 import os
-import pickle
 import pyxdf
+from pipeline_cache import StageCache, add_cache_arguments, cache_from_args, file_key
+from result_store import has_results, save_results
 from utils import *
 
 TIMINGS = ['prestim', 'stim']
 DISPS= ['neutral', 'trigger'] # dispositions, may not be the best name
 
+# parameters of the cached pipeline stages, changing one recomputes that stage and everything after it
+BANDPASS = {'low': 2, 'high': 50}
+FLAT_VOLTAGE = 0.1
+MONTAGE = 'ceegrid_coords.csv'
+TMIN, TMAX = -0.5, 4
+N_INTERPOLATE = [1, 2, 3, 4]
+AR_MODES = ['cell', 'pooled']
+PSD_FMIN, PSD_FMAX = 2, 50
+
 def setup_parser():
     parser = argparse.ArgumentParser(
                     prog='analyze_subject',
-                    description='analyze a single control or experimental subject and dump the results in a .pkl file',
+                    description='analyze a single control or experimental subject and write the results to a lazily loadable result store',
                     epilog='Text at the bottom of help')
     parser.add_argument('group', choices=['c', 'e'], help="c for control, e for experimental")
     parser.add_argument('index', help="index of subject, i.e. X for CTRLX or EXPX")
-    parser.add_argument('-o', '--output', help="name of the .pkl output file")
+    parser.add_argument('-o', '--output', help="output directory of the result store")
     parser.add_argument('-n', '--no_ar_fit', action='store_true', help="do not fit autoreject to epochs, only for saving time debugging")
     parser.add_argument('-p', '--plot_save', action='store_true', help="save plots")
+    parser.add_argument('--xdf_block_size', type=int, help="decode the XDF file incrementally, holding at most this many samples per stream in memory")
+    parser.add_argument('--latency_offsets', help="latency_offsets.json from calibrate_latency.py, shifts each stimulus marker to its acoustic onset")
+    add_ar_arguments(parser)
+    add_cache_arguments(parser)
     return parser
 
-def main():
-    parser = setup_parser()
-    cmd_args = parser.parse_args()
+def add_ar_arguments(parser):
+    parser.add_argument('-a', '--ar_mode', choices=AR_MODES, default='cell', help="cell: fit autoreject separately on each timing/disposition epoch set, pooled: fit once on all ast epochs and apply it to each set")
+    parser.add_argument('--ar_jobs', type=int, default=1, help="number of cores for the autoreject cross-validation")
 
+def find_subject_files(group):
     exp_path = os.path.join("exp_data","02_Experimental")
     control_path = os.path.join("exp_data","01_Control")
     glob_pattern = os.path.join("**","*.xdf")
 
+    # sorted so a subject keeps its index (and output directory) across runs
+    if group == 'c':
+        return sorted(glob.glob(os.path.join(control_path,glob_pattern),recursive=True))
+    return sorted(glob.glob(os.path.join(exp_path,glob_pattern),recursive=True))
+
+def subject_out_dir(group, index, root="processed"):
+    if group == 'c':
+        out_dir = os.path.join(root, "CTRL")
+    else:
+        out_dir = os.path.join(root, "EXP")
+    return out_dir + str(index).zfill(2)
+
+def is_complete(out_dir):
+    """True if a previous run of analyze finished writing its results to out_dir"""
+    return has_results(out_dir)
+
+def main():
+    parser = setup_parser()
+    cmd_args = parser.parse_args()
+
     out_dir = cmd_args.output
     if not out_dir:
-        out_dir = "processed"
-        if not os.path.isdir("processed"):
-            os.mkdir("processed")
-        if cmd_args.group == 'c':
-            out_dir = os.path.join(out_dir, "CTRL")
-        else:
-            out_dir = os.path.join(out_dir, "EXP")
-        out_dir += str(cmd_args.index).zfill(2)
-    
-    if not os.path.isdir(out_dir):
-        os.mkdir(out_dir)
+        out_dir = subject_out_dir(cmd_args.group, cmd_args.index)
 
-    if cmd_args.group == 'c':
-        files = glob.glob(os.path.join(control_path,glob_pattern),recursive=True)
-    else:
-        files = glob.glob(os.path.join(exp_path,glob_pattern),recursive=True)
+    files = find_subject_files(cmd_args.group)
     sub_idx = int(cmd_args.index) - 1; # account for 1-indexing
 
-    raw, events, mapping = read_data(
-        files[sub_idx], bandpass={'low': 2, 'high': 50}, flat_voltage=0.1)
-    montage = mne.channels.read_custom_montage(
-        'ceegrid_coords.csv', coord_frame='head')
-    raw.set_montage(montage)
-    raw.interpolate_bads(reset_bads=True)
+    analyze(files[sub_idx], out_dir,
+            no_ar_fit=cmd_args.no_ar_fit, plot_save=cmd_args.plot_save,
+            ar_mode=cmd_args.ar_mode, ar_jobs=cmd_args.ar_jobs,
+            xdf_block_size=cmd_args.xdf_block_size, latency_offsets=cmd_args.latency_offsets,
+            cache=cache_from_args(cmd_args))
+
+def analyze(file_path, out_dir, no_ar_fit=False, plot_save=False,
+            ar_mode='cell', ar_jobs=1, xdf_block_size=None, latency_offsets=None, cache=None):
+    os.makedirs(out_dir, exist_ok=True)
+    if cache is None:
+        cache = StageCache(None)
+
+    def load_raw():
+        return read_data(file_path, bandpass=BANDPASS, flat_voltage=FLAT_VOLTAGE,
+                         block_size=xdf_block_size, latency_offsets=latency_offsets)
+    raw_stage = cache.stage(
+        'raw', {'bandpass': BANDPASS, 'flat_voltage': FLAT_VOLTAGE,
+                'latency_offsets': latency_offsets and file_key(latency_offsets)},
+        load_raw, parent=file_key(file_path))
+
+    def interpolate():
+        raw, _, _ = raw_stage.get()
+        montage = mne.channels.read_custom_montage(
+            MONTAGE, coord_frame='head')
+        raw.set_montage(montage)
+        raw.interpolate_bads(reset_bads=True)
+        return raw
+    interp_stage = cache.stage(
+        'interpolate', {'montage': file_key(MONTAGE)}, interpolate, parent=raw_stage)
     event_type = 'ast'
 
-    epochs = {timing: {disp: mne.Epochs(
-        raw, events, event_id=mapping[event_type][timing][disp],
-        tmin=-0.5, tmax=4, preload=True)
-        for disp in DISPS}
-        for timing in TIMINGS}
-    
-    ar = autoreject.AutoReject(n_interpolate=[1, 2, 3, 4], random_state=11,
-                           n_jobs=1, verbose=True)
-
-    if cmd_args.no_ar_fit:
-        ar.fit(epochs[TIMINGS[0]][DISPS[0]])
-    
-    epochs_ar = {}
-    for timing in TIMINGS:
-        epochs_ar[timing] = {}
-        for disp in DISPS:
-            if not cmd_args.no_ar_fit:
-                ar.fit(epochs[timing][disp])
-            epochs_ar[timing][disp] = ar.transform(epochs[timing][disp])
-
-    psd_power = {}
-    psd_freqs = {}
-    for timing in TIMINGS:
-        psd_power[timing] = {}
-        psd_freqs[timing] = {}
-        for disp in DISPS:
-            psd_power[timing][disp], psd_freqs[timing][disp] = calculate_power_spectrum(
-                epochs[timing][disp], fmin=2, fmax=50, mean=True)
+    def make_epochs():
+        raw = interp_stage.get()
+        _, events, mapping = raw_stage.get()
+        return {timing: {disp: mne.Epochs(
+            raw, events, event_id=mapping[event_type][timing][disp],
+            tmin=TMIN, tmax=TMAX, preload=True)
+            for disp in DISPS}
+            for timing in TIMINGS}
+    epochs_stage = cache.stage(
+        'epochs', {'event_type': event_type, 'tmin': TMIN, 'tmax': TMAX,
+                   'timings': TIMINGS, 'disps': DISPS},
+        make_epochs, parent=interp_stage)
+
+    def fit_autoreject():
+        epochs = epochs_stage.get()
+        ar = autoreject.AutoReject(n_interpolate=N_INTERPOLATE, random_state=11,
+                               n_jobs=ar_jobs, verbose=True)
+
+        if no_ar_fit:
+            ar.fit(epochs[TIMINGS[0]][DISPS[0]])
+        elif ar_mode == 'pooled':
+            # one set of thresholds per recording, fitted on the union of all ast epochs
+            ar.fit(mne.concatenate_epochs(
+                [epochs[timing][disp] for timing in TIMINGS for disp in DISPS]))
+        
+        epochs_ar = {}
+        for timing in TIMINGS:
+            epochs_ar[timing] = {}
+            for disp in DISPS:
+                if not no_ar_fit and ar_mode == 'cell':
+                    ar.fit(epochs[timing][disp])
+                epochs_ar[timing][disp] = ar.transform(epochs[timing][disp])
+        return epochs_ar
+    epochs_ar = cache.stage(
+        'autoreject', {'n_interpolate': N_INTERPOLATE, 'random_state': 11,
+                       'no_ar_fit': no_ar_fit, 'ar_mode': ar_mode},
+        fit_autoreject, parent=epochs_stage).get()
+
+    def compute_psd():
+        epochs = epochs_stage.get()
+        psd_power = {}
+        psd_freqs = {}
+        for timing in TIMINGS:
+            psd_power[timing] = {}
+            psd_freqs[timing] = {}
+            for disp in DISPS:
+                psd_power[timing][disp], psd_freqs[timing][disp] = calculate_power_spectrum(
+                    epochs[timing][disp], fmin=PSD_FMIN, fmax=PSD_FMAX, mean=True)
+        return psd_power, psd_freqs
+    psd_power, psd_freqs = cache.stage(
+        'psd', {'method': 'multitaper', 'fmin': PSD_FMIN, 'fmax': PSD_FMAX},
+        compute_psd, parent=epochs_stage).get()
 
     # implicit assumption for dividing power spectra
     for disp in DISPS:
@@ -99,10 +168,11 @@ def main():
     for disp in DISPS:
         psd_normalized_power[disp] = psd_power['stim'][disp] / psd_power['prestim'][disp]
 
-    if cmd_args.plot_save:
+    if plot_save:
         for disp in DISPS:
             plot_power_spectrum(psd_normalized_power[disp], psd_freqs['prestim'][disp], already_mean=True)
             plt.savefig(os.path.join(out_dir, f"psd_{disp}.png"))
+            plt.close('all')
     
     tfr_delta_freqs = np.logspace(*np.log10([1, 4]), num=8) # alpha band frequencies
     tfr_theta_freqs = np.logspace(*np.log10([4, 8]), num=8) # alpha band frequencies
@@ -112,31 +182,37 @@ def main():
 
     tfr_bands = {'delta': tfr_delta_freqs, 'theta': tfr_theta_freqs, 'alpha': tfr_alpha_freqs, 'beta': tfr_beta_freqs, 'gamma': tfr_gamma_freqs}
 
-    tfr_power = {}
-    tfr_itc = {}
-    for band in tfr_bands:
-        tfr_power[band] = {}
-        tfr_itc[band] = {}
+    def compute_tfr():
+        epochs = epochs_stage.get()
+        tfr_power = {band: {timing: {} for timing in TIMINGS} for band in tfr_bands}
+        tfr_itc = {band: {timing: {} for timing in TIMINGS} for band in tfr_bands}
         for timing in TIMINGS:
-            tfr_power[band][timing] = {}
-            tfr_itc[band][timing] = {}
             for disp in DISPS:
-                tfr_power[band][timing][disp], tfr_itc[band][timing][disp] = compute_tf_analysis(
-                    epochs[timing][disp], tfr_bands[band], tfr_bands[band] / 2.0)
-
-    if cmd_args.plot_save:
+                # all bands in one wavelet pass per epoch set
+                band_power, band_itc = compute_tf_bands(epochs[timing][disp], tfr_bands)
+                for band in tfr_bands:
+                    tfr_power[band][timing][disp] = band_power[band]
+                    tfr_itc[band][timing][disp] = band_itc[band]
+        return tfr_power, tfr_itc
+    tfr_power, tfr_itc = cache.stage(
+        'tfr', {'bands': {band: freqs.tolist() for band, freqs in tfr_bands.items()},
+                'n_cycles': 'freqs / 2', 'decim': 3},
+        compute_tfr, parent=epochs_stage).get()
+
+    if plot_save:
         for band in tfr_bands:
             for timing in TIMINGS:
                 for disp in DISPS:
                     plot_tf_analysis(tfr_power[band][timing][disp])
                     plt.savefig(os.path.join(out_dir, f"tfr_band_{band}_{timing}_{disp}.png"))
+                    plt.close('all')
     
-    if cmd_args.plot_save:
+    if plot_save:
         for band in tfr_bands:
             for disp in DISPS:
                 plot_tf_difference(tfr_power[band]['stim'][disp], tfr_power[band]['prestim'][disp])
                 plt.savefig(os.path.join(out_dir, f"tfr_diff_{band}_{disp}.png"))
-                pass
+                plt.close('all')
 
     output = {
         'epochs': {},
@@ -144,7 +220,7 @@ def main():
         'tfr': {}
     }
 
-    output['epochs'] = epochs
+    output['epochs'] = epochs_stage.get()
     output['psd'] = {
         'power': psd_power,
         'normalized_power': psd_normalized_power,
@@ -157,11 +233,9 @@ def main():
         } for band in tfr_bands
     }
 
-    out_pkl = os.path.join(out_dir, "data.pkl")
-
-    with open(out_pkl, 'wb') as f:
-        pickle.dump(output, f)
+    save_results(out_dir, output)
     
-    print(f"pickled output written to {out_dir}")
+    print(f"results written to {out_dir}")
 
-main()
\ No newline at end of file
+if __name__ == "__main__":
+    main()
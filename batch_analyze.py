@@ -0,0 +1,122 @@
+import argparse
+import concurrent.futures
+import json
+import multiprocessing
+import os
+import time
+import traceback
+
+# one BLAS/OpenMP thread per worker, the pool provides the parallelism.
+# Must be set before numpy is imported by the workers.
+for _var in ['OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS']:
+    os.environ.setdefault(_var, '1')
+os.environ.setdefault('MPLBACKEND', 'Agg')
+
+import analyze_subject
+from pipeline_cache import add_cache_arguments, cache_from_args
+from result_store import read_cohort, write_cohort
+
+GROUPS = ['c', 'e']
+
+def setup_parser():
+    parser = argparse.ArgumentParser(
+                    prog='batch_analyze',
+                    description='run analyze_subject over every control and/or experimental subject in a process pool',
+                    epilog='subjects whose output directory is already complete are skipped, so an interrupted run can simply be restarted')
+    parser.add_argument('-g', '--group', action='append', choices=GROUPS, help="c for control, e for experimental, can be repeated (default: both)")
+    parser.add_argument('-j', '--workers', type=int, default=os.cpu_count(), help="number of worker processes")
+    parser.add_argument('-m', '--memory_gb', type=float, help="memory budget of each worker in GB, a subject exceeding it fails with MemoryError")
+    parser.add_argument('-o', '--output', default="processed", help="root directory of the per-subject output directories")
+    parser.add_argument('-n', '--no_ar_fit', action='store_true', help="do not fit autoreject to epochs, only for saving time debugging")
+    parser.add_argument('-p', '--plot_save', action='store_true', help="save plots")
+    parser.add_argument('--xdf_block_size', type=int, help="decode XDF files incrementally, holding at most this many samples per stream in memory, use with --memory_gb for long recordings")
+    parser.add_argument('--latency_offsets', help="latency_offsets.json from calibrate_latency.py, shifts each stimulus marker to its acoustic onset")
+    analyze_subject.add_ar_arguments(parser)
+    add_cache_arguments(parser)
+    return parser
+
+def _init_worker(memory_bytes):
+    if memory_bytes is None:
+        return
+    try:
+        import resource
+    except ImportError:
+        print("worker memory budget is not supported on this platform, ignoring it")
+        return
+    # RLIMIT_DATA covers heap and anonymous mmaps on Linux, unlike RLIMIT_AS it
+    # does not count the address space reserved by thread stacks and libraries
+    limit = getattr(resource, 'RLIMIT_DATA', resource.RLIMIT_AS)
+    resource.setrlimit(limit, (memory_bytes, memory_bytes))
+
+def _run_subject(file_path, out_dir, options):
+    start = time.time()
+    analyze_subject.analyze(file_path, out_dir, **options)
+    return time.time() - start
+
+def main():
+    parser = setup_parser()
+    cmd_args = parser.parse_args()
+
+    os.makedirs(cmd_args.output, exist_ok=True)
+    index_path = os.path.join(cmd_args.output, "cohort.jsonl")
+    # combined store of every complete subject, see result_store.CohortStore
+    cohort = read_cohort(cmd_args.output)
+
+    jobs = []
+    for group in dict.fromkeys(cmd_args.group or GROUPS):
+        for index, file_path in enumerate(analyze_subject.find_subject_files(group), start=1):
+            out_dir = analyze_subject.subject_out_dir(group, index, cmd_args.output)
+            if analyze_subject.is_complete(out_dir):
+                print(f"skipping {out_dir}, already complete")
+                cohort[os.path.basename(out_dir)] = {'group': group, 'index': index, 'file': file_path}
+                continue
+            jobs.append((group, index, file_path, out_dir))
+    write_cohort(cmd_args.output, cohort)
+
+    if not jobs:
+        print("nothing to do")
+        return
+
+    memory_bytes = None
+    if cmd_args.memory_gb:
+        memory_bytes = int(cmd_args.memory_gb * 1024 ** 3)
+    options = {
+        'no_ar_fit': cmd_args.no_ar_fit,
+        'plot_save': cmd_args.plot_save,
+        'ar_mode': cmd_args.ar_mode,
+        'ar_jobs': cmd_args.ar_jobs,
+        'xdf_block_size': cmd_args.xdf_block_size,
+        'latency_offsets': cmd_args.latency_offsets,
+        'cache': cache_from_args(cmd_args),
+    }
+    workers = max(1, min(cmd_args.workers, len(jobs)))
+    print(f"analyzing {len(jobs)} subjects with {workers} workers")
+
+    # spawn so every platform gets fresh workers without the parent's state
+    with concurrent.futures.ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker, initargs=(memory_bytes,)) as pool, \
+            open(index_path, 'a') as index_file:
+        futures = {
+            pool.submit(_run_subject, file_path, out_dir, options): (group, index, file_path, out_dir)
+            for group, index, file_path, out_dir in jobs
+        }
+        for done, future in enumerate(concurrent.futures.as_completed(futures), start=1):
+            group, index, file_path, out_dir = futures[future]
+            record = {'group': group, 'index': index, 'file': file_path, 'out_dir': out_dir}
+            try:
+                record['elapsed'] = future.result()
+                record['status'] = 'done'
+                cohort[os.path.basename(out_dir)] = {'group': group, 'index': index, 'file': file_path}
+                write_cohort(cmd_args.output, cohort)
+            except Exception as e:
+                record['status'] = 'failed'
+                record['error'] = "".join(
+                    traceback.format_exception(type(e), e, e.__traceback__))
+            # flush every record so the index survives a crash of the parent
+            index_file.write(json.dumps(record) + "\n")
+            index_file.flush()
+            print(f"[{done}/{len(jobs)}] {out_dir}: {record['status']}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,250 @@
+import argparse
+import datetime
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import tempfile
+import time
+import tracemalloc
+
+os.environ.setdefault('MPLBACKEND', 'Agg')
+
+import mne
+import numpy as np
+from utils import (calculate_power_spectrum, compute_tf_analysis, create_events,
+                   create_mappings, create_mne, parse_xdf)
+from synthetic_devices import SyntheticEEG, SyntheticPPG, SyntheticVideo
+from xdf_io import XDFWriter
+
+EEG_SRATE = 125
+VIDEO_FPS = 30
+PPG_SRATE = 50
+CHUNK_SECONDS = 0.5  # LabRecorder writes a chunk per stream about twice a second
+TRIAL_SECONDS = 12
+# same epoch window as analyze_subject
+TMIN, TMAX = -0.5, 4
+HLT_STIMULI = ['tone_3dB', 'tone_5dB', 'tone_10dB', 'tone_20dB', 'tone_40dB']
+LET_STIMULI = ['SNR0', 'SNR5', 'SNR10', 'SNR15', 'SNR20']
+AST_STIMULI = ['control_1', 'control_2', 'trigger_1', 'trigger_2']
+# the trials start after the pmt block and end 2 s before the recording does
+FIRST_TRIAL_SECONDS = 14.0
+END_SECONDS = 2
+# shortest recording with a full hlt, let and ast block, epoching needs the ast markers
+MIN_DURATION = FIRST_TRIAL_SECONDS + TRIAL_SECONDS * (
+    len(HLT_STIMULI) + len(LET_STIMULI) + len(AST_STIMULI)) + END_SECONDS
+# largest EEG timestamp difference allowed between xdf_io.stream_xdf and pyxdf, in seconds
+MAX_TIMESTAMP_DIFF = 1e-5
+
+
+def setup_parser():
+    parser = argparse.ArgumentParser(
+                    prog='benchmark',
+                    description='time the XDF -> MNE -> spectral pipeline on synthetic recordings and append the results to a JSON history',
+                    epilog='runs offline, the recordings are generated with the same stream layout as hearing.py and LabRecorder produce')
+    parser.add_argument('-d', '--durations', type=float, nargs='+', default=[5, 20], help="recording durations to benchmark, in minutes")
+    parser.add_argument('-r', '--repeat', type=int, default=3, help="number of timed runs of each step, the median and minimum are reported")
+    parser.add_argument('--video', action='store_true', help="add a 30 fps Video stream to the recordings")
+    parser.add_argument('--ppg', action='store_true', help="add a 50 Hz PPG stream to the recordings")
+    parser.add_argument('--block_size', type=int, default=65536, help="block size of the streaming parse_xdf step")
+    parser.add_argument('-o', '--output', default=os.path.join("processed", "benchmark_history.jsonl"), help="JSON lines file the results are appended to")
+    parser.add_argument('--keep', help="directory to keep the synthetic recordings in, by default they are deleted")
+    parser.add_argument('--seed', type=int, default=0, help="random seed of the synthetic data")
+    return parser
+
+
+def marker_schedule(duration):
+    """Marker labels and onsets (seconds from the start) in the order hearing.py presents them"""
+    markers = [(1.0, 'start'), (2.0, 'pmt_prestim'), (6.0, 'pmt_stim'), (10.0, 'pmt_poststim')]
+    t = FIRST_TRIAL_SECONDS
+    blocks = [('hlt', HLT_STIMULI, True), ('let', LET_STIMULI, True), ('ast', AST_STIMULI, False)]
+    block_index = 0
+    while t + TRIAL_SECONDS <= duration - END_SECONDS:
+        prefix, stimuli, has_response = blocks[block_index % len(blocks)]
+        for name in stimuli:
+            if t + TRIAL_SECONDS > duration - END_SECONDS:
+                break
+            markers.append((t, f"{prefix}_prestim-{name}"))
+            markers.append((t + 4, f"{prefix}_stim-{name}"))
+            markers.append((t + 8, f"{prefix}_poststim-{name}"))
+            if has_response:
+                markers.append((t + 10, f"{prefix}_response-{name}"))
+            t += TRIAL_SECONDS
+        block_index += 1
+    markers.append((duration - 1, 'end'))
+    return markers
+
+
+def write_synthetic_xdf(file_path, duration, video=False, ppg=False, seed=0):
+    """
+    Write a recording with the layout of our real ones: a 16 channel 125 Hz
+    obci_eeg1 stream in microvolts, the HearingMarkerStream and optionally the
+    Video and PPG streams, interleaved in half-second chunks with clock offsets.
+    The data is generated a chunk at a time, so long recordings fit in memory.
+    """
+    rng = np.random.default_rng(seed)
+    start = 1000.0
+    markers = marker_schedule(duration)
+    # the same signal generators synthetic_devices.py streams live
+    devices = [(1, SyntheticEEG(EEG_SRATE, seed=seed))]
+    if video:
+        devices.append((3, SyntheticVideo(VIDEO_FPS, seed=seed)))
+    if ppg:
+        devices.append((4, SyntheticPPG(PPG_SRATE, seed=seed)))
+    with XDFWriter(file_path) as writer:
+        writer.add_stream(2, 'HearingMarkerStream', 'Markers', 1, 'string', 0, 'hearingid2023')
+        for stream_id, device in devices:
+            writer.add_stream(stream_id, device.name, device.stream_type, device.channel_count,
+                              device.channel_format, device.srate, device.source_id)
+        streams = [(2, None)] + devices
+        stream_ids = [stream_id for stream_id, _ in streams]
+
+        marker_index = 0
+        n_chunks = int(np.ceil(duration / CHUNK_SECONDS))
+        for chunk in range(n_chunks):
+            t0 = chunk * CHUNK_SECONDS
+            t1 = min(t0 + CHUNK_SECONDS, duration)
+            for stream_id, device in streams:
+                if device is None:
+                    labels = []
+                    while marker_index < len(markers) and markers[marker_index][0] < t1:
+                        labels.append(markers[marker_index])
+                        marker_index += 1
+                    writer.write_samples(stream_id, [[label] for _, label in labels],
+                                         [start + onset for onset, _ in labels])
+                    continue
+                index = np.arange(int(np.ceil(t0 * device.srate)), int(np.ceil(t1 * device.srate)))
+                values = device.generate(len(index))
+                # small timing jitter, like real device timestamps
+                stamps = start + index / device.srate + rng.normal(0, 0.2 / EEG_SRATE, len(index))
+                writer.write_samples(stream_id, values.astype(np.float32), stamps)
+            if chunk % 10 == 0:
+                for stream_id in stream_ids:
+                    writer.write_clock_offset(stream_id, start + t1, -0.001 * (stream_id - 1))
+
+
+def measure(step, repeat):
+    """
+    Time step() repeat times, then run it once more under tracemalloc for the
+    peak memory, so the tracing overhead does not distort the timings.
+    Returns the result of the last run and the measurements.
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        step()
+        times.append(time.perf_counter() - start)
+    tracemalloc.start()
+    result = step()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, {'median_s': statistics.median(times), 'min_s': min(times),
+                    'runs': times, 'peak_mb': peak / 1024 ** 2}
+
+
+def benchmark_recording(file_path, repeat, block_size):
+    results = {}
+
+    def parse():
+        return parse_xdf(file_path, cache_dir=None)
+    (marker_data, eeg_stream, insert_points), results['parse_xdf'] = measure(parse, repeat)
+
+    def parse_streaming():
+        cache_dir = tempfile.mkdtemp(prefix='bench_xdf_')
+        try:
+            parse_xdf(file_path, cache_dir=cache_dir, block_size=block_size)
+        finally:
+            shutil.rmtree(cache_dir, ignore_errors=True)
+    _, results['parse_xdf_streaming'] = measure(parse_streaming, repeat)
+    # the streaming reader must be a drop-in replacement for pyxdf.load_xdf
+    check_dir = tempfile.mkdtemp(prefix='bench_xdf_')
+    try:
+        _, streamed_eeg, _ = parse_xdf(file_path, cache_dir=check_dir, block_size=block_size)
+        timestamp_diff = float(np.max(np.abs(streamed_eeg['time_stamps'] - eeg_stream['time_stamps'])))
+        del streamed_eeg
+    finally:
+        shutil.rmtree(check_dir, ignore_errors=True)
+    results['parse_xdf_streaming']['max_timestamp_diff_s'] = timestamp_diff
+    if timestamp_diff > MAX_TIMESTAMP_DIFF:
+        raise RuntimeError(f"streaming parse_xdf timestamps differ from pyxdf's by up to {timestamp_diff * 1000:.3f} ms")
+
+    marker_dict, id_binding, category_mapping = create_mappings(
+        marker_data, ['pmt', 'hlt', 'let', 'ast'])
+    events = create_events(insert_points, marker_dict, marker_data)
+
+    def make_raw():
+        return create_mne(eeg_stream, events, id_binding)
+    raw, results['create_mne'] = measure(make_raw, repeat)
+
+    def make_epochs():
+        return {disp: mne.Epochs(raw, events, event_id=category_mapping['ast']['stim'][disp],
+                                 tmin=TMIN, tmax=TMAX, preload=True, verbose=False)
+                for disp in ['neutral', 'trigger']}
+    epochs, results['epochs'] = measure(make_epochs, repeat)
+
+    def psd():
+        return [calculate_power_spectrum(epochs[disp], fmin=2, fmax=50, mean=True)
+                for disp in epochs]
+    _, results['calculate_power_spectrum'] = measure(psd, repeat)
+
+    freqs = np.logspace(*np.log10([8, 13]), num=8)
+
+    def tfr():
+        return [compute_tf_analysis(epochs[disp], freqs, freqs / 2.0) for disp in epochs]
+    _, results['compute_tf_analysis'] = measure(tfr, repeat)
+    return results
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = setup_parser()
+    cmd_args = parser.parse_args()
+    if min(cmd_args.durations) * 60 < MIN_DURATION:
+        parser.error(f"durations must be at least {MIN_DURATION / 60:.2f} min, shorter recordings have no ast trials to epoch")
+    mne.set_log_level('WARNING')
+
+    work_dir = cmd_args.keep or tempfile.mkdtemp(prefix='benchmark_')
+    os.makedirs(work_dir, exist_ok=True)
+    record = {
+        'date': datetime.datetime.now().isoformat(timespec='seconds'),
+        'revision': git_revision(),
+        'platform': platform.platform(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'mne': mne.__version__,
+        'cpu_count': os.cpu_count(),
+        'repeat': cmd_args.repeat,
+        'recordings': [],
+    }
+    try:
+        for minutes in cmd_args.durations:
+            file_path = os.path.join(work_dir, f"synthetic_{minutes:g}min.xdf")
+            write_synthetic_xdf(file_path, minutes * 60, video=cmd_args.video,
+                                ppg=cmd_args.ppg, seed=cmd_args.seed)
+            print(f"{minutes:g} min recording, {os.path.getsize(file_path) / 1024 ** 2:.1f} MB")
+            steps = benchmark_recording(file_path, cmd_args.repeat, cmd_args.block_size)
+            for step, result in steps.items():
+                print(f"  {step:26s} {result['median_s']:8.3f} s  {result['peak_mb']:8.1f} MB peak")
+            record['recordings'].append({
+                'minutes': minutes, 'video': cmd_args.video, 'ppg': cmd_args.ppg,
+                'file_mb': os.path.getsize(file_path) / 1024 ** 2, 'steps': steps})
+    finally:
+        if not cmd_args.keep:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    os.makedirs(os.path.dirname(cmd_args.output) or ".", exist_ok=True)
+    with open(cmd_args.output, 'a') as f:
+        f.write(json.dumps(record) + "\n")
+    print(f"appended results to {cmd_args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+import argparse
+import datetime
+import json
+import os
+import random
+import threading
+import numpy as np
+from pylsl import StreamInfo, StreamOutlet, local_clock
+
+LOOPBACK_STREAM = 'AudioLoopback'
+STIM_FOLDERS = [os.path.join("stimuli", "hlt"), os.path.join("stimuli", "let"), os.path.join("stimuli", "ast")]
+
+
+def setup_parser():
+    parser = argparse.ArgumentParser(
+                    prog='calibrate_latency',
+                    description='measure the delay between stimulus markers and the actual sound output with a loopback or line-in recording',
+                    epilog='connect the audio output to an input channel (or use a loopback device) before running. The loopback is also published as an LSL stream, so LabRecorder can record it for later analysis with --xdf')
+    parser.add_argument('-s', '--stimuli', nargs='+', default=STIM_FOLDERS, help="stimulus folders, markers are named like the experiment's: <folder>_stim-<name> for hlt/let/ast, stim-<name> otherwise")
+    parser.add_argument('-r', '--repeats', type=int, default=20, help="number of times each stimulus is played")
+    parser.add_argument('--isi', type=float, default=1.5, help="seconds between stimulus onsets")
+    parser.add_argument('--secs', type=float, default=1.0, help="seconds of each stimulus to play")
+    parser.add_argument('-d', '--device', help="input device of the loopback capture (name or index), default input device if not given")
+    parser.add_argument('-c', '--channel', type=int, default=0, help="input channel carrying the loopback signal")
+    parser.add_argument('--srate', type=int, default=48000, help="sample rate of the loopback capture")
+    parser.add_argument('--screen', type=int, default=1, help="screen of the fullscreen window whose flips schedule the sounds, the one hearing.py runs on")
+    parser.add_argument('--xdf', help="analyze an existing recording with a marker stream and an AudioLoopback stream instead of playing stimuli")
+    parser.add_argument('-o', '--output', default=os.path.join("exp_data", "latency_offsets.json"), help="output JSON of per-stimulus latencies, pass it to read_data(latency_offsets=...) or analyze_subject --latency_offsets")
+    return parser
+
+
+def marker_prefix(folder):
+    folder = os.path.basename(os.path.normpath(folder))
+    return f"{folder}_stim" if folder in ('hlt', 'let', 'ast') else "stim"
+
+
+class LoopbackRecorder:
+    """
+    Captures one input channel with sounddevice, pushes it to an LSL stream and
+    keeps it in memory. Block timestamps come from PortAudio's ADC time mapped
+    onto the LSL clock, so they do not include the callback scheduling delay.
+    """
+
+    def __init__(self, device=None, channel=0, srate=48000, block_size=256):
+        import sounddevice as sd
+        self.channel = channel
+        self.srate = srate
+        self.blocks = []
+        self.block_times = []
+        self.lock = threading.Lock()
+        info = StreamInfo(LOOPBACK_STREAM, 'Audio', 1, srate, 'float32', 'audioloopback')
+        self.outlet = StreamOutlet(info, chunk_size=block_size)
+        device = int(device) if device is not None and device.isdigit() else device
+        self.stream = sd.InputStream(device=device, channels=channel + 1, samplerate=srate,
+                                     blocksize=block_size, dtype='float32',
+                                     latency='low', callback=self._callback)
+        self.clock_offset = None
+
+    def _callback(self, indata, frames, time_info, status):
+        if status:
+            print(f"loopback: {status}")
+        if self.clock_offset is None:
+            self.clock_offset = local_clock() - self.stream.time
+        first = time_info.inputBufferAdcTime + self.clock_offset
+        block = indata[:, self.channel].copy()
+        # push_chunk stamps the most recent sample of the chunk
+        self.outlet.push_chunk(block[:, None].tolist(), first + (frames - 1) / self.srate)
+        with self.lock:
+            self.blocks.append(block)
+            self.block_times.append(first)
+
+    def start(self):
+        self.stream.start()
+
+    def stop(self):
+        self.stream.stop()
+        self.stream.close()
+
+    def data(self):
+        """The capture so far and a timestamp per sample"""
+        with self.lock:
+            blocks, block_times = list(self.blocks), list(self.block_times)
+        audio = np.concatenate(blocks)
+        lengths = np.array([len(block) for block in blocks])
+        starts = np.repeat(np.array(block_times), lengths)
+        offsets = np.arange(len(audio)) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        return audio, starts + offsets / self.srate
+
+
+def play_stimuli(cmd_args, marker_outlet):
+    """
+    Play every stimulus repeats times in random order, started on a window flip
+    with play(when=win) and the marker stamped with that flip's time, exactly as
+    hearing.py's trial engine does, so the offsets measure its scheduling path.
+    Returns: list of (marker label, timestamp)
+    """
+    from psychopy import prefs
+    prefs.hardware['audioLib'] = 'ptb'
+    prefs.hardware['audioLatencyMode'] = '3'
+    from psychopy import core, sound, visual
+    from stimulus_pool import StimulusPool
+    from trial_engine import flip_onset_timestamp
+
+    win = visual.Window(fullscr=True, screen=cmd_args.screen, winType='pyglet', allowGUI=False,
+                        color=[-1.0000, -1.0000, -1.0000], colorSpace='rgb', units='height',
+                        checkTiming=False)
+    player = sound.Sound('A', secs=-1, stereo=True, hamming=True, name='calibration_sound')
+    pool = StimulusPool(channels=2)
+    trials = []
+    for folder in cmd_args.stimuli:
+        paths = [os.path.join(folder, file) for file in sorted(os.listdir(folder))
+                 if file.endswith('.wav') or file.endswith('.mp3')]
+        pool.add(paths, player.sampleRate, secs=cmd_args.secs)
+        trials += [(path, f"{marker_prefix(folder)}-{os.path.basename(path).split('.')[0]}")
+                   for path in paths]
+    trials = trials * cmd_args.repeats
+    random.shuffle(trials)
+
+    markers = []
+    try:
+        for i, (path, label) in enumerate(trials):
+            player.setSound(pool[path], hamming=False, log=False)
+            onset = flip_onset_timestamp(win)
+            player.play(when=win)  # sync with win flip
+            marker_outlet.push_sample([label], onset)
+            win.flip()
+            markers.append((label, onset))
+            print(f"[{i + 1}/{len(trials)}] {label}")
+            core.wait(cmd_args.isi)
+            player.stop()
+    finally:
+        win.close()
+    return markers
+
+
+def load_loopback_xdf(file_path):
+    import pyxdf
+    streams, _ = pyxdf.load_xdf(file_path)
+    markers = next(s for s in streams if s['info']['type'][0] == 'Markers')
+    loopback = next(s for s in streams if s['info']['name'][0] == LOOPBACK_STREAM)
+    srate = float(loopback['info']['nominal_srate'][0])
+    return (np.array(markers['time_series']).squeeze(), np.asarray(markers['time_stamps']),
+            np.asarray(loopback['time_series'])[:, 0], np.asarray(loopback['time_stamps']), srate)
+
+
+def main():
+    parser = setup_parser()
+    cmd_args = parser.parse_args()
+    # utils pulls in mne and matplotlib, which are only needed for the analysis
+    from utils import measure_audio_latencies
+
+    if cmd_args.xdf:
+        marker_data, marker_timestamps, audio, audio_timestamps, srate = load_loopback_xdf(cmd_args.xdf)
+        source = cmd_args.xdf
+    else:
+        marker_outlet = StreamOutlet(StreamInfo('HearingMarkerStream', 'Markers', 1, 0, 'string', 'latencycalibration'))
+        recorder = LoopbackRecorder(cmd_args.device, cmd_args.channel, cmd_args.srate)
+        recorder.start()
+        try:
+            markers = play_stimuli(cmd_args, marker_outlet)
+        finally:
+            recorder.stop()
+        marker_data = np.array([label for label, _ in markers])
+        marker_timestamps = np.array([timestamp for _, timestamp in markers])
+        audio, audio_timestamps = recorder.data()
+        srate = cmd_args.srate
+        source = 'live'
+
+    stimuli = measure_audio_latencies(marker_data, marker_timestamps, audio, audio_timestamps, srate)
+    print(f"{'stimulus':30s} {'n':>4s} {'mean ms':>8s} {'jitter':>8s} {'p99':>8s}")
+    for label, stats in stimuli.items():
+        if stats['n'] == 0:
+            print(f"{label:30s} {0:4d}  no onsets detected")
+            continue
+        print(f"{label:30s} {stats['n']:4d} {stats['mean'] * 1e3:8.2f} "
+              f"{stats['jitter'] * 1e3:8.2f} {stats['p99'] * 1e3:8.2f}")
+
+    os.makedirs(os.path.dirname(cmd_args.output) or ".", exist_ok=True)
+    with open(cmd_args.output, 'w') as f:
+        json.dump({'date': datetime.datetime.now().isoformat(timespec='seconds'),
+                   'source': source, 'stimuli': stimuli}, f, indent=1)
+    print(f"wrote {cmd_args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+import os
+import struct
+import numpy as np
+
+# header: magic, format version, nominal fps, then one little-endian float64 LSL
+# timestamp per frame of the video, in file order
+MAGIC = b'FIDX'
+HEADER = struct.Struct('<4sId')
+
+
+def sidecar_path(video_path):
+    return os.path.splitext(video_path)[0] + ".frames"
+
+
+class FrameIndexWriter:
+    """Appends the LSL timestamp of every frame written to a video, buffering block frames"""
+
+    def __init__(self, path, fps, block=64):
+        self.file = open(path, 'wb')
+        self.file.write(HEADER.pack(MAGIC, 1, fps))
+        self.block = block
+        self.pending = []
+
+    def append(self, timestamp):
+        self.pending.append(timestamp)
+        if len(self.pending) >= self.block:
+            self.flush()
+
+    def flush(self):
+        if self.pending:
+            self.file.write(np.asarray(self.pending, dtype='<f8').tobytes())
+            self.pending = []
+        self.file.flush()
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+
+class FrameIndex:
+    """
+    Memory-mapped frame index of a recorded video, so frames can be found by
+    LSL timestamp with a binary search, without loading the XDF Video stream:
+
+        index = FrameIndex(sidecar_path('sub-01/01.avi'))
+        first, last = index.frames_between(onset, onset + 4)
+    """
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            magic, version, self.fps = HEADER.unpack(f.read(HEADER.size))
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a frame index")
+        n_frames = (os.path.getsize(path) - HEADER.size) // 8
+        self.timestamps = np.memmap(path, dtype='<f8', mode='r', offset=HEADER.size,
+                                    shape=(n_frames,)) if n_frames else np.empty(0)
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def frame_at(self, timestamp):
+        """Index of the last frame captured at or before timestamp, -1 if none"""
+        return int(np.searchsorted(self.timestamps, timestamp, side='right')) - 1
+
+    def frames_between(self, start, stop):
+        """Range of frame indices captured in [start, stop)"""
+        return (int(np.searchsorted(self.timestamps, start, side='left')),
+                int(np.searchsorted(self.timestamps, stop, side='left')))
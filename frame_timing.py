@@ -0,0 +1,213 @@
+import argparse
+import struct
+import numpy as np
+
+# header: magic, format version, nominal frame duration in seconds, length of the
+# routine names that follow ('\n' separated utf-8), then one record per flip of
+# the LSL timestamp after the flip and the number of the routine it belongs to,
+# with IDLE set when the engine deliberately did not flip before it
+MAGIC = b'FTLG'
+HEADER = struct.Struct('<4sIdI')
+RECORD = np.dtype([('time', '<f8'), ('routine', '<u2')])
+IDLE = 0x8000
+# flips before the first routine, e.g. the one that resets the flip timer
+NO_ROUTINE = '(none)'
+CHANNELS = ['frames', 'missed_frames', 'median_interval_ms', 'max_interval_ms']
+
+
+def setup_parser():
+    parser = argparse.ArgumentParser(
+                    prog='frame_timing',
+                    description='summarize the frame timing log of a session',
+                    epilog='prints the frame count, missed frames and p50/p99/max flip interval of every routine. Example: python frame_timing.py exp_data/sub-01/sub-01_task-hearing_run-1_frametiming.bin')
+    parser.add_argument('file', help="frame timing log written by FrameTimer")
+    return parser
+
+
+def measure_frame_duration(win, frame_rate=None):
+    """
+    Seconds per frame, from the rate measured when the window opened or, if that
+    failed, from 60 flips now. The rate is rounded to whole Hz like Builder does,
+    so measurement noise (59.94 instead of 60) does not shift frame-counted durations.
+    """
+    if not frame_rate:
+        _, _, median_ms = win.getMsPerFrame(nFrames=60, showVisual=False)
+        frame_rate = 1000.0 / median_ms
+    return 1.0 / round(frame_rate)
+
+
+def create_outlet(source_id='hearingframetiming'):
+    """
+    LSL stream of the frame timing, one sample per publish interval: the flips,
+    the frames they missed, and the median and longest flip interval in ms.
+    Create it before LabRecorder starts so the stream is part of the recording.
+    """
+    from pylsl import StreamInfo, StreamOutlet
+    info = StreamInfo('FrameTiming', 'FrameTiming', len(CHANNELS), 0, 'float32', source_id)
+    channels = info.desc().append_child("channels")
+    for label in CHANNELS:
+        channels.append_child("channel").append_child_value("label", label)
+    return StreamOutlet(info)
+
+
+def summarize(frame_dur, routines, times, ids, late_factor=1.5):
+    """
+    Per routine frame statistics. Every flip interval belongs to the routine
+    of the flip that ends it, so the setup before a routine's first frame (e.g.
+    loading its sound) counts towards that routine. Idle waits are left out.
+    Returns: list of dicts with the routine, frames, missed frames and p50/p99/max interval in ms
+    """
+    idle = (ids & IDLE) != 0
+    ids = ids & (IDLE - 1)
+    intervals = np.diff(times)[~idle[1:]]
+    interval_ids = ids[1:][~idle[1:]]
+    missed = np.where(intervals > late_factor * frame_dur,
+                      np.maximum(np.rint(intervals / frame_dur) - 1, 1), 0)
+    rows = []
+    for routine_id, name in enumerate(routines):
+        mask = interval_ids == routine_id
+        frames = int(np.count_nonzero(ids == routine_id))
+        if not frames:
+            continue
+        row = {'routine': name, 'frames': frames, 'missed': int(missed[mask].sum()),
+               'p50': np.nan, 'p99': np.nan, 'max': np.nan}
+        if mask.any():
+            p50, p99 = np.percentile(intervals[mask], [50, 99]) * 1000
+            row.update(p50=p50, p99=p99, max=intervals[mask].max() * 1000)
+        rows.append(row)
+    return rows
+
+
+def format_report(frame_dur, rows):
+    lines = [f"frame timing, {frame_dur * 1000:.2f} ms per frame",
+             f"  {'routine':20s} {'frames':>8s} {'missed':>7s} {'p50 ms':>8s} {'p99 ms':>8s} {'max ms':>8s}"]
+    for row in rows:
+        lines.append(f"  {row['routine']:20s} {row['frames']:8d} {row['missed']:7d} "
+                     f"{row['p50']:8.2f} {row['p99']:8.2f} {row['max']:8.2f}")
+    return "\n".join(lines)
+
+
+def read_log(path):
+    """Returns: nominal frame duration, routine names and the records (time, routine) of a frame timing log"""
+    with open(path, 'rb') as f:
+        magic, version, frame_dur, names_length = HEADER.unpack(f.read(HEADER.size))
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a frame timing log")
+        routines = f.read(names_length).decode('utf-8').split('\n')
+        records = np.fromfile(f, dtype=RECORD)
+    return frame_dur, routines, records
+
+
+class FrameTimer:
+    """
+    Records the time of every win.flip() of a session, by wrapping it, and the
+    routine it belongs to. Each second the flips, missed frames and the median
+    and longest interval go to the FrameTiming LSL stream; every flip is
+    appended to a binary log (see read_log), and close() prints the p50/p99
+    flip interval of each routine:
+
+        frame_timer = FrameTimer(win, frameDur, ['welcome', 'hlt_stim'], log_path, outlet)
+        frame_timer.begin_routine('welcome')
+        ...
+        frame_timer.close()
+
+    A flip counts as late when it comes more than late_factor frames after the
+    previous one.
+    """
+
+    def __init__(self, win, frame_dur, routines, path, outlet=None, publish_interval=1.0,
+                 late_factor=1.5, block=256):
+        from pylsl import local_clock
+        self.clock = local_clock
+        self.win = win
+        self.frame_dur = frame_dur
+        self.routines = [NO_ROUTINE] + [name for name in dict.fromkeys(routines) if name != NO_ROUTINE]
+        self.routine_ids = {name: routine_id for routine_id, name in enumerate(self.routines)}
+        self.routine_id = 0
+        self.idle_next = False
+        self.outlet = outlet
+        self.publish_interval = publish_interval
+        self.late_after = late_factor * frame_dur
+        self.late_factor = late_factor
+        self.block = block
+        self.times, self.ids = [], []
+        self.written = self.published = 0
+        names = "\n".join(self.routines).encode('utf-8')
+        self.file = open(path, 'wb')
+        self.file.write(HEADER.pack(MAGIC, 1, frame_dur, len(names)) + names)
+        self.flip_window = win.flip
+        win.flip = self.flip
+        self.next_publish = self.clock() + publish_interval
+
+    def begin_routine(self, name):
+        if name not in self.routine_ids:
+            # log files only name the routines given up front
+            print(f"frame timing: {name} was not declared, counting its frames as {NO_ROUTINE}")
+            self.routine_ids[name] = 0
+        self.routine_id = self.routine_ids[name]
+
+    def idle(self):
+        """The next flip ends a deliberate wait, e.g. an idle routine, so its interval is not timed"""
+        self.idle_next = True
+
+    def flip(self, *args, **kwargs):
+        flip_time = self.flip_window(*args, **kwargs)
+        now = self.clock()
+        self.times.append(now)
+        if self.idle_next:
+            self.idle_next = False
+            self.ids.append(self.routine_id | IDLE)
+        else:
+            self.ids.append(self.routine_id)
+        if now >= self.next_publish:
+            self.publish(now)
+        if len(self.times) - self.written >= self.block:
+            self.write()
+        return flip_time
+
+    def publish(self, now):
+        """Push the flips since the last sample to the FrameTiming stream"""
+        self.next_publish = now + self.publish_interval
+        start = max(self.published - 1, 0)
+        self.published = len(self.times)
+        if self.outlet is None:
+            return
+        ids = np.asarray(self.ids[start + 1:])
+        intervals = np.diff(self.times[start:])[(ids & IDLE) == 0]
+        if not len(intervals):
+            return
+        late = intervals[intervals > self.late_after]
+        missed = np.maximum(np.rint(late / self.frame_dur) - 1, 1).sum()
+        self.outlet.push_sample([len(intervals), missed, np.median(intervals) * 1000,
+                                 intervals.max() * 1000], now)
+
+    def write(self):
+        records = np.empty(len(self.times) - self.written, dtype=RECORD)
+        records['time'] = self.times[self.written:]
+        records['routine'] = self.ids[self.written:]
+        self.file.write(records.tobytes())
+        self.written = len(self.times)
+
+    def summary(self):
+        return summarize(self.frame_dur, self.routines, np.asarray(self.times),
+                         np.asarray(self.ids), self.late_factor)
+
+    def close(self):
+        """Restore win.flip, publish and write the remaining flips, and print the report"""
+        if self.file.closed:
+            return
+        self.win.flip = self.flip_window
+        self.publish(self.clock())
+        self.write()
+        self.file.close()
+        print(format_report(self.frame_dur, self.summary()))
+
+
+def main():
+    parser = setup_parser()
+    cmd_args = parser.parse_args()
+    frame_dur, routines, records = read_log(cmd_args.file)
+    print(format_report(frame_dur, summarize(frame_dur, routines, records['time'], records['routine'])))
+
+if __name__ == "__main__":
+    main()
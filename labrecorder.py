@@ -0,0 +1,131 @@
+import os
+import socket
+import time
+
+RCS_PORT = 22345
+# %p participant, %b task, %n run, %s session, %a acquisition, %m modality
+TEMPLATE_FIELDS = {'participant': '%p', 'task': '%b', 'run': '%n', 'session': '%s',
+                   'acquisition': '%a', 'modality': '%m'}
+
+
+class LabRecorderError(RuntimeError):
+    pass
+
+
+def resolve_streams(stream_types, timeout=10.0):
+    """
+    Wait until an LSL stream of every type in stream_types is visible, or raise
+    LabRecorderError naming the missing ones once timeout seconds have passed.
+    Returns: dict of stream type -> names of the streams found
+    """
+    from pylsl import resolve_byprop
+    deadline = time.monotonic() + timeout
+    found, missing = {}, []
+    for stream_type in stream_types:
+        # one deadline for all types, so the whole check never takes longer than timeout
+        streams = resolve_byprop('type', stream_type, minimum=1,
+                                 timeout=max(0.0, deadline - time.monotonic()))
+        if streams:
+            found[stream_type] = [stream.name() for stream in streams]
+        else:
+            missing.append(stream_type)
+    if missing:
+        raise LabRecorderError(f"no LSL stream of type {', '.join(missing)} found within {timeout:g} s")
+    return found
+
+
+def has_samples(path):
+    """True once the XDF file at path, possibly still being written, has a Samples chunk"""
+    from xdf_io import SAMPLES, iter_chunks, open_xdf
+    try:
+        with open_xdf(path) as f:
+            return any(tag == SAMPLES for tag, _, _ in iter_chunks(f))
+    except (OSError, ValueError, IndexError):
+        return False  # not created yet, or shorter than the XDF magic
+
+
+def recording_path(root, template, **fields):
+    """File name LabRecorder makes of a template, e.g. sub-%p/sub-%p_task-%b_run-%n.xdf"""
+    path = template
+    for field, value in fields.items():
+        if value is not None:
+            path = path.replace(TEMPLATE_FIELDS[field], str(value))
+    return os.path.join(root, path)
+
+
+class LabRecorderClient:
+    """
+    Controls LabRecorder through its remote control socket (RCS). LabRecorder
+    does not acknowledge commands, so start_recording() checks the LSL streams
+    are there before selecting them, then watches the output file until the
+    recording is actually written to:
+
+        lab_recorder = LabRecorderClient()
+        lab_recorder.start_recording(['Markers', 'EEG'], root_dir, template, participant='01', task='hearing')
+        ...
+        lab_recorder.stop_recording()
+    """
+
+    def __init__(self, host='localhost', port=RCS_PORT, timeout=5.0):
+        try:
+            self.socket = socket.create_connection((host, port), timeout=timeout)
+        except OSError as e:
+            raise LabRecorderError(f"could not connect to LabRecorder on {host}:{port}, "
+                                   f"is it running with remote control enabled? ({e})") from e
+        self.path = None
+        self.recording = False
+
+    def send(self, command):
+        self.socket.sendall(f"{command}\n".encode('utf-8'))
+
+    def start_recording(self, stream_types, root, template, resolve_timeout=10.0,
+                        start_timeout=10.0, **fields):
+        """
+        Resolve stream_types, start recording to root/template (fields fill the
+        template placeholders) and block until the file receives data.
+        Returns: path of the recording
+        """
+        found = resolve_streams(stream_types, resolve_timeout)
+        for stream_type, names in found.items():
+            print(f"found {stream_type} stream(s): {', '.join(names)}")
+        settings = [f"{{root:{root}}}", f"{{template:{template}}}"]
+        settings += [f"{{{field}:{value}}}" for field, value in fields.items() if value is not None]
+        started = time.time()
+        self.send("update")
+        self.send("select all")
+        self.send("filename " + " ".join(settings))
+        self.send("start")
+        self.recording = True
+        self.path = self.wait_for_data(recording_path(root, template, **fields), started, start_timeout)
+        print(f"recording to {self.path}")
+        return self.path
+
+    def wait_for_data(self, path, since, timeout, poll=0.05):
+        """
+        Wait until a recording modified after since (a time.time() value) exists
+        at path, or is the newest .xdf in its folder, and holds a Samples chunk,
+        i.e. LabRecorder got past the stream headers it writes on start.
+        """
+        deadline = time.monotonic() + timeout
+        folder = os.path.dirname(path)
+        while time.monotonic() < deadline:
+            candidates = [path] if os.path.exists(path) else []
+            if not candidates and os.path.isdir(folder):
+                # LabRecorder may number runs differently than the template suggests
+                candidates = [os.path.join(folder, file) for file in os.listdir(folder) if file.endswith('.xdf')]
+            candidates = [file for file in candidates if os.path.getmtime(file) >= since - 1]
+            if candidates:
+                current = max(candidates, key=os.path.getmtime)
+                if has_samples(current):
+                    return current
+            time.sleep(poll)
+        raise LabRecorderError(f"LabRecorder did not write any data to {path} within {timeout:g} s")
+
+    def stop_recording(self):
+        if self.recording:
+            self.send("stop")
+            self.recording = False
+
+    def close(self):
+        self.stop_recording()
+        self.socket.close()
@@ -36,18 +36,23 @@ from psychopy.hardware import keyboard
 # Run 'Before Experiment' code from code_init
 import os
 import random
+import functools
 from pylsl import StreamInfo, StreamOutlet
-import socket
 from psychopy import sound
+from labrecorder import LabRecorderClient
+from trial_engine import KeyResponse, Loop, Routine, TrialEngine
 
-marker_info = StreamInfo('HearingMarkerStream', 'Markers',
-                         1, 0, 'string', 'hearingid2023')
-
-marker_outlet = StreamOutlet(marker_info)
 started_recording = False
-lsl_socket = socket.create_connection(("localhost", 22345))
-#print('!!!---Lab Recorder Not Started---!!!')
-#lsl_socket = None
+lab_recorder = None
+
+def cleanup():
+    """Stop LabRecorder, however the session ended"""
+    global started_recording
+    if started_recording:
+        if lab_recorder:
+            lab_recorder.close()
+        started_recording = False
+
 # --- Setup global variables (available in all functions) ---
 # Ensure that relative paths start from the same directory as this script
 _thisDir = os.path.dirname(os.path.abspath(__file__))
@@ -332,39 +337,32 @@ def run(expInfo, thisExp, win, inputs, globalClock=None, thisSession=None):
     
     # Start Code - component code to be run after the window creation
     
-    # --- Initialize components for Routine "welcome" ---
+    # --- Initialize components ---
     # Run 'Begin Experiment' code from code_init
     sound_files = ['babycry', 'chewing', 'engine', 'seawave', 'typing']
     repeat = int(expInfo['sound_repeat'])
     pupil_duration = int(expInfo['test_duration'])
     range_time = int(expInfo['range_duration'])
     
-    #sound_dict = {}
-    #for sf in sound_files:
-    #    sound_path = os.path.join('sounds', f"{sf}.wav")
-    #    sound_stimuli = sound.Sound(sound_path, secs=-1, stereo=-1, hamming=True, 
-    #    volume=-1, name=sf)
-    #    sound_dict[sf] = sound_stimuli
-    
     sound_files = sound_files * repeat
-    n_trials = len(sound_files)
     random.shuffle(sound_files)
-    sound_idx = 0
-    
+    trials = [{'stim': os.path.join('sounds', f"{name}.wav"), 'name': name} for name in sound_files]
     
     participant_id = expInfo['participant']
     task = 'passive'
     
-    if lsl_socket is not None:
-        started_recording = True
-        config_str = f'filename {{template:sub-%p/sub-%p_task-%b.xdf}} {{participant:{participant_id}}} {{task:{task}}}\n'
-        print(config_str)
+    # created with the session rather than at import, before LabRecorder selects the streams
+    marker_info = StreamInfo('HearingMarkerStream', 'Markers',
+                             1, 0, 'string', 'hearingid2023')
+    marker_outlet = StreamOutlet(marker_info)
+    
+    # connect here rather than at import, and only continue once LabRecorder is writing
+    global started_recording, lab_recorder
+    lab_recorder = LabRecorderClient()
+    started_recording = True
+    lab_recorder.start_recording(['Markers', 'EEG'], os.path.join(os.getcwd(), "exp_data"),
+                                 "sub-%p/sub-%p_task-%b.xdf", participant=participant_id, task=task)
     
-        lsl_socket.sendall(b"update\n")
-        lsl_socket.sendall(b"select all\n")
-        lsl_socket.sendall(config_str.encode('utf-8'))
-        lsl_socket.sendall(b"start\n")
-        
     
     text_2 = visual.TextStim(win=win, name='text_2',
         text='Start Range Test \n\n(Press Space)',
@@ -375,23 +373,19 @@ def run(expInfo, thisExp, win, inputs, globalClock=None, thisSession=None):
         depth=-1.0);
     key_resp = keyboard.Keyboard()
     
-    # --- Initialize components for Routine "black" ---
     black_screen_2 = visual.Rect(
         win=win, name='black_screen_2',
         width=(2, 1)[0], height=(2, 1)[1],
         ori=0.0, pos=(0, 0), anchor='center',
         lineWidth=1.0,     colorSpace='rgb',  lineColor=[-1.0000, -1.0000, -1.0000], fillColor=[-1.0000, -1.0000, -1.0000],
         opacity=None, depth=-1.0, interpolate=True)
-    
-    # --- Initialize components for Routine "gray" ---
     gray_screen = visual.Rect(
         win=win, name='gray_screen',
         width=(2, 1)[0], height=(2, 1)[1],
         ori=0.0, pos=(0, 0), anchor='center',
         lineWidth=1.0,     colorSpace='rgb',  lineColor=[0.0039, 0.0039, 0.0039], fillColor=[0.0039, 0.0039, 0.0039],
         opacity=None, depth=-1.0, interpolate=True)
-    
-    # --- Initialize components for Routine "pre_stim" ---
+    # fixation cross of pre_stim and post_stim
     cross = visual.ShapeStim(
         win=win, name='cross', vertices='cross',
         size=(0.5, 0.5),
@@ -399,7 +393,6 @@ def run(expInfo, thisExp, win, inputs, globalClock=None, thisSession=None):
         lineWidth=1.0,     colorSpace='rgb',  lineColor='white', fillColor='white',
         opacity=None, depth=-1.0, interpolate=True)
     
-    # --- Initialize components for Routine "stim" ---
     current_sound = sound.Sound('A', secs=-1, stereo=True, hamming=True,
         name='current_sound')
     current_sound.setVolume(1.0)
@@ -411,14 +404,6 @@ def run(expInfo, thisExp, win, inputs, globalClock=None, thisSession=None):
         languageStyle='LTR',
         depth=-2.0);
     
-    # --- Initialize components for Routine "post_stim" ---
-    cross_2 = visual.ShapeStim(
-        win=win, name='cross_2', vertices='cross',
-        size=(0.5, 0.5),
-        ori=0.0, pos=(0, 0), anchor='center',
-        lineWidth=1.0,     colorSpace='rgb',  lineColor='white', fillColor='white',
-        opacity=None, depth=-1.0, interpolate=True)
-    
     # create some handy timers
     if globalClock is None:
         globalClock = core.Clock()  # to track the time since experiment started
@@ -430,657 +415,29 @@ def run(expInfo, thisExp, win, inputs, globalClock=None, thisSession=None):
     # store the exact time the global clock started
     expInfo['expStart'] = data.getDateStr(format='%Y-%m-%d %Hh%M.%S.%f %z', fractionalSecondDigits=6)
     
-    # --- Prepare to start Routine "welcome" ---
-    continueRoutine = True
-    # update component parameters for each repeat
-    thisExp.addData('welcome.started', globalClock.getTime())
-    key_resp.keys = []
-    key_resp.rt = []
-    _key_resp_allKeys = []
-    # keep track of which components have finished
-    welcomeComponents = [text_2, key_resp]
-    for thisComponent in welcomeComponents:
-        thisComponent.tStart = None
-        thisComponent.tStop = None
-        thisComponent.tStartRefresh = None
-        thisComponent.tStopRefresh = None
-        if hasattr(thisComponent, 'status'):
-            thisComponent.status = NOT_STARTED
-    # reset timers
-    t = 0
-    _timeToFirstFrame = win.getFutureFlipTime(clock="now")
-    frameN = -1
-    
-    # --- Run Routine "welcome" ---
-    routineForceEnded = not continueRoutine
-    while continueRoutine:
-        # get current time
-        t = routineTimer.getTime()
-        tThisFlip = win.getFutureFlipTime(clock=routineTimer)
-        tThisFlipGlobal = win.getFutureFlipTime(clock=None)
-        frameN = frameN + 1  # number of completed frames (so 0 is the first frame)
-        # update/draw components on each frame
-        
-        # *text_2* updates
-        
-        # if text_2 is starting this frame...
-        if text_2.status == NOT_STARTED and tThisFlip >= 0.0-frameTolerance:
-            # keep track of start time/frame for later
-            text_2.frameNStart = frameN  # exact frame index
-            text_2.tStart = t  # local t and not account for scr refresh
-            text_2.tStartRefresh = tThisFlipGlobal  # on global time
-            win.timeOnFlip(text_2, 'tStartRefresh')  # time at next scr refresh
-            # add timestamp to datafile
-            thisExp.timestampOnFlip(win, 'text_2.started')
-            # update status
-            text_2.status = STARTED
-            text_2.setAutoDraw(True)
-        
-        # if text_2 is active this frame...
-        if text_2.status == STARTED:
-            # update params
-            pass
-        
-        # *key_resp* updates
-        waitOnFlip = False
-        
-        # if key_resp is starting this frame...
-        if key_resp.status == NOT_STARTED and tThisFlip >= 0.0-frameTolerance:
-            # keep track of start time/frame for later
-            key_resp.frameNStart = frameN  # exact frame index
-            key_resp.tStart = t  # local t and not account for scr refresh
-            key_resp.tStartRefresh = tThisFlipGlobal  # on global time
-            win.timeOnFlip(key_resp, 'tStartRefresh')  # time at next scr refresh
-            # add timestamp to datafile
-            thisExp.timestampOnFlip(win, 'key_resp.started')
-            # update status
-            key_resp.status = STARTED
-            # keyboard checking is just starting
-            waitOnFlip = True
-            win.callOnFlip(key_resp.clock.reset)  # t=0 on next screen flip
-            win.callOnFlip(key_resp.clearEvents, eventType='keyboard')  # clear events on next screen flip
-        if key_resp.status == STARTED and not waitOnFlip:
-            theseKeys = key_resp.getKeys(keyList=['space'], ignoreKeys=["escape"], waitRelease=False)
-            _key_resp_allKeys.extend(theseKeys)
-            if len(_key_resp_allKeys):
-                key_resp.keys = _key_resp_allKeys[-1].name  # just the last key pressed
-                key_resp.rt = _key_resp_allKeys[-1].rt
-                key_resp.duration = _key_resp_allKeys[-1].duration
-                # a response ends the routine
-                continueRoutine = False
-        
-        # check for quit (typically the Esc key)
-        if defaultKeyboard.getKeys(keyList=["escape"]):
-            thisExp.status = FINISHED
-        if thisExp.status == FINISHED or endExpNow:
-            endExperiment(thisExp, inputs=inputs, win=win)
-            return
-        
-        # check if all components have finished
-        if not continueRoutine:  # a component has requested a forced-end of Routine
-            routineForceEnded = True
-            break
-        continueRoutine = False  # will revert to True if at least one component still running
-        for thisComponent in welcomeComponents:
-            if hasattr(thisComponent, "status") and thisComponent.status != FINISHED:
-                continueRoutine = True
-                break  # at least one component has not yet finished
-        
-        # refresh the screen
-        if continueRoutine:  # don't flip if this routine is over or we'll get a blank screen
-            win.flip()
-    
-    # --- Ending Routine "welcome" ---
-    for thisComponent in welcomeComponents:
-        if hasattr(thisComponent, "setAutoDraw"):
-            thisComponent.setAutoDraw(False)
-    thisExp.addData('welcome.stopped', globalClock.getTime())
-    # check responses
-    if key_resp.keys in ['', [], None]:  # No response was made
-        key_resp.keys = None
-    thisExp.addData('key_resp.keys',key_resp.keys)
-    if key_resp.keys != None:  # we had a response
-        thisExp.addData('key_resp.rt', key_resp.rt)
-        thisExp.addData('key_resp.duration', key_resp.duration)
-    thisExp.nextEntry()
-    # the Routine "welcome" was not non-slip safe, so reset the non-slip timer
-    routineTimer.reset()
-    
-    # --- Prepare to start Routine "black" ---
-    continueRoutine = True
-    # update component parameters for each repeat
-    thisExp.addData('black.started', globalClock.getTime())
-    # Run 'Begin Routine' code from code_black
-    marker_outlet.push_sample(["range-black"])
-    # keep track of which components have finished
-    blackComponents = [black_screen_2]
-    for thisComponent in blackComponents:
-        thisComponent.tStart = None
-        thisComponent.tStop = None
-        thisComponent.tStartRefresh = None
-        thisComponent.tStopRefresh = None
-        if hasattr(thisComponent, 'status'):
-            thisComponent.status = NOT_STARTED
-    # reset timers
-    t = 0
-    _timeToFirstFrame = win.getFutureFlipTime(clock="now")
-    frameN = -1
-    
-    # --- Run Routine "black" ---
-    routineForceEnded = not continueRoutine
-    while continueRoutine:
-        # get current time
-        t = routineTimer.getTime()
-        tThisFlip = win.getFutureFlipTime(clock=routineTimer)
-        tThisFlipGlobal = win.getFutureFlipTime(clock=None)
-        frameN = frameN + 1  # number of completed frames (so 0 is the first frame)
-        # update/draw components on each frame
-        
-        # *black_screen_2* updates
-        
-        # if black_screen_2 is starting this frame...
-        if black_screen_2.status == NOT_STARTED and tThisFlip >= 0.0-frameTolerance:
-            # keep track of start time/frame for later
-            black_screen_2.frameNStart = frameN  # exact frame index
-            black_screen_2.tStart = t  # local t and not account for scr refresh
-            black_screen_2.tStartRefresh = tThisFlipGlobal  # on global time
-            win.timeOnFlip(black_screen_2, 'tStartRefresh')  # time at next scr refresh
-            # add timestamp to datafile
-            thisExp.timestampOnFlip(win, 'black_screen_2.started')
-            # update status
-            black_screen_2.status = STARTED
-            black_screen_2.setAutoDraw(True)
-        
-        # if black_screen_2 is active this frame...
-        if black_screen_2.status == STARTED:
-            # update params
-            pass
-        
-        # if black_screen_2 is stopping this frame...
-        if black_screen_2.status == STARTED:
-            # is it time to stop? (based on global clock, using actual start)
-            if tThisFlipGlobal > black_screen_2.tStartRefresh + range_time-frameTolerance:
-                # keep track of stop time/frame for later
-                black_screen_2.tStop = t  # not accounting for scr refresh
-                black_screen_2.frameNStop = frameN  # exact frame index
-                # add timestamp to datafile
-                thisExp.timestampOnFlip(win, 'black_screen_2.stopped')
-                # update status
-                black_screen_2.status = FINISHED
-                black_screen_2.setAutoDraw(False)
-        
-        # check for quit (typically the Esc key)
-        if defaultKeyboard.getKeys(keyList=["escape"]):
-            thisExp.status = FINISHED
-        if thisExp.status == FINISHED or endExpNow:
-            endExperiment(thisExp, inputs=inputs, win=win)
-            return
-        
-        # check if all components have finished
-        if not continueRoutine:  # a component has requested a forced-end of Routine
-            routineForceEnded = True
-            break
-        continueRoutine = False  # will revert to True if at least one component still running
-        for thisComponent in blackComponents:
-            if hasattr(thisComponent, "status") and thisComponent.status != FINISHED:
-                continueRoutine = True
-                break  # at least one component has not yet finished
-        
-        # refresh the screen
-        if continueRoutine:  # don't flip if this routine is over or we'll get a blank screen
-            win.flip()
-    
-    # --- Ending Routine "black" ---
-    for thisComponent in blackComponents:
-        if hasattr(thisComponent, "setAutoDraw"):
-            thisComponent.setAutoDraw(False)
-    thisExp.addData('black.stopped', globalClock.getTime())
-    # the Routine "black" was not non-slip safe, so reset the non-slip timer
-    routineTimer.reset()
-    
-    # --- Prepare to start Routine "gray" ---
-    continueRoutine = True
-    # update component parameters for each repeat
-    thisExp.addData('gray.started', globalClock.getTime())
-    # Run 'Begin Routine' code from code_gray
-    marker_outlet.push_sample(["range-gray"])
-    # keep track of which components have finished
-    grayComponents = [gray_screen]
-    for thisComponent in grayComponents:
-        thisComponent.tStart = None
-        thisComponent.tStop = None
-        thisComponent.tStartRefresh = None
-        thisComponent.tStopRefresh = None
-        if hasattr(thisComponent, 'status'):
-            thisComponent.status = NOT_STARTED
-    # reset timers
-    t = 0
-    _timeToFirstFrame = win.getFutureFlipTime(clock="now")
-    frameN = -1
-    
-    # --- Run Routine "gray" ---
-    routineForceEnded = not continueRoutine
-    while continueRoutine:
-        # get current time
-        t = routineTimer.getTime()
-        tThisFlip = win.getFutureFlipTime(clock=routineTimer)
-        tThisFlipGlobal = win.getFutureFlipTime(clock=None)
-        frameN = frameN + 1  # number of completed frames (so 0 is the first frame)
-        # update/draw components on each frame
-        
-        # *gray_screen* updates
-        
-        # if gray_screen is starting this frame...
-        if gray_screen.status == NOT_STARTED and tThisFlip >= 0-frameTolerance:
-            # keep track of start time/frame for later
-            gray_screen.frameNStart = frameN  # exact frame index
-            gray_screen.tStart = t  # local t and not account for scr refresh
-            gray_screen.tStartRefresh = tThisFlipGlobal  # on global time
-            win.timeOnFlip(gray_screen, 'tStartRefresh')  # time at next scr refresh
-            # add timestamp to datafile
-            thisExp.timestampOnFlip(win, 'gray_screen.started')
-            # update status
-            gray_screen.status = STARTED
-            gray_screen.setAutoDraw(True)
-        
-        # if gray_screen is active this frame...
-        if gray_screen.status == STARTED:
-            # update params
-            pass
-        
-        # if gray_screen is stopping this frame...
-        if gray_screen.status == STARTED:
-            # is it time to stop? (based on global clock, using actual start)
-            if tThisFlipGlobal > gray_screen.tStartRefresh + range_time-frameTolerance:
-                # keep track of stop time/frame for later
-                gray_screen.tStop = t  # not accounting for scr refresh
-                gray_screen.frameNStop = frameN  # exact frame index
-                # add timestamp to datafile
-                thisExp.timestampOnFlip(win, 'gray_screen.stopped')
-                # update status
-                gray_screen.status = FINISHED
-                gray_screen.setAutoDraw(False)
-        
-        # check for quit (typically the Esc key)
-        if defaultKeyboard.getKeys(keyList=["escape"]):
-            thisExp.status = FINISHED
-        if thisExp.status == FINISHED or endExpNow:
-            endExperiment(thisExp, inputs=inputs, win=win)
-            return
-        
-        # check if all components have finished
-        if not continueRoutine:  # a component has requested a forced-end of Routine
-            routineForceEnded = True
-            break
-        continueRoutine = False  # will revert to True if at least one component still running
-        for thisComponent in grayComponents:
-            if hasattr(thisComponent, "status") and thisComponent.status != FINISHED:
-                continueRoutine = True
-                break  # at least one component has not yet finished
-        
-        # refresh the screen
-        if continueRoutine:  # don't flip if this routine is over or we'll get a blank screen
-            win.flip()
-    
-    # --- Ending Routine "gray" ---
-    for thisComponent in grayComponents:
-        if hasattr(thisComponent, "setAutoDraw"):
-            thisComponent.setAutoDraw(False)
-    thisExp.addData('gray.stopped', globalClock.getTime())
-    # the Routine "gray" was not non-slip safe, so reset the non-slip timer
-    routineTimer.reset()
-    
-    # set up handler to look after randomisation of conditions etc
-    trials = data.TrialHandler(nReps=n_trials, method='sequential', 
-        extraInfo=expInfo, originPath=-1,
-        trialList=[None],
-        seed=None, name='trials')
-    thisExp.addLoop(trials)  # add the loop to the experiment
-    thisTrial = trials.trialList[0]  # so we can initialise stimuli with some values
-    # abbreviate parameter names if possible (e.g. rgb = thisTrial.rgb)
-    if thisTrial != None:
-        for paramName in thisTrial:
-            globals()[paramName] = thisTrial[paramName]
-    
-    for thisTrial in trials:
-        currentLoop = trials
-        thisExp.timestampOnFlip(win, 'thisRow.t')
-        # pause experiment here if requested
-        if thisExp.status == PAUSED:
-            pauseExperiment(
-                thisExp=thisExp, 
-                inputs=inputs, 
-                win=win, 
-                timers=[routineTimer], 
-                playbackComponents=[]
-        )
-        # abbreviate parameter names if possible (e.g. rgb = thisTrial.rgb)
-        if thisTrial != None:
-            for paramName in thisTrial:
-                globals()[paramName] = thisTrial[paramName]
-        
-        # --- Prepare to start Routine "pre_stim" ---
-        continueRoutine = True
-        # update component parameters for each repeat
-        thisExp.addData('pre_stim.started', globalClock.getTime())
-        # Run 'Begin Routine' code from code
-        name = sound_files[sound_idx]
-        marker_outlet.push_sample([f"pre-stim-{name}"])
-        sound_path = os.path.join('sounds', f"{name}.wav")
-        # keep track of which components have finished
-        pre_stimComponents = [cross]
-        for thisComponent in pre_stimComponents:
-            thisComponent.tStart = None
-            thisComponent.tStop = None
-            thisComponent.tStartRefresh = None
-            thisComponent.tStopRefresh = None
-            if hasattr(thisComponent, 'status'):
-                thisComponent.status = NOT_STARTED
-        # reset timers
-        t = 0
-        _timeToFirstFrame = win.getFutureFlipTime(clock="now")
-        frameN = -1
-        
-        # --- Run Routine "pre_stim" ---
-        routineForceEnded = not continueRoutine
-        while continueRoutine and routineTimer.getTime() < 3.0:
-            # get current time
-            t = routineTimer.getTime()
-            tThisFlip = win.getFutureFlipTime(clock=routineTimer)
-            tThisFlipGlobal = win.getFutureFlipTime(clock=None)
-            frameN = frameN + 1  # number of completed frames (so 0 is the first frame)
-            # update/draw components on each frame
-            
-            # *cross* updates
-            
-            # if cross is starting this frame...
-            if cross.status == NOT_STARTED and tThisFlip >= 0.0-frameTolerance:
-                # keep track of start time/frame for later
-                cross.frameNStart = frameN  # exact frame index
-                cross.tStart = t  # local t and not account for scr refresh
-                cross.tStartRefresh = tThisFlipGlobal  # on global time
-                win.timeOnFlip(cross, 'tStartRefresh')  # time at next scr refresh
-                # add timestamp to datafile
-                thisExp.timestampOnFlip(win, 'cross.started')
-                # update status
-                cross.status = STARTED
-                cross.setAutoDraw(True)
-            
-            # if cross is active this frame...
-            if cross.status == STARTED:
-                # update params
-                pass
-            
-            # if cross is stopping this frame...
-            if cross.status == STARTED:
-                # is it time to stop? (based on global clock, using actual start)
-                if tThisFlipGlobal > cross.tStartRefresh + 3-frameTolerance:
-                    # keep track of stop time/frame for later
-                    cross.tStop = t  # not accounting for scr refresh
-                    cross.frameNStop = frameN  # exact frame index
-                    # add timestamp to datafile
-                    thisExp.timestampOnFlip(win, 'cross.stopped')
-                    # update status
-                    cross.status = FINISHED
-                    cross.setAutoDraw(False)
-            
-            # check for quit (typically the Esc key)
-            if defaultKeyboard.getKeys(keyList=["escape"]):
-                thisExp.status = FINISHED
-            if thisExp.status == FINISHED or endExpNow:
-                endExperiment(thisExp, inputs=inputs, win=win)
-                return
-            
-            # check if all components have finished
-            if not continueRoutine:  # a component has requested a forced-end of Routine
-                routineForceEnded = True
-                break
-            continueRoutine = False  # will revert to True if at least one component still running
-            for thisComponent in pre_stimComponents:
-                if hasattr(thisComponent, "status") and thisComponent.status != FINISHED:
-                    continueRoutine = True
-                    break  # at least one component has not yet finished
-            
-            # refresh the screen
-            if continueRoutine:  # don't flip if this routine is over or we'll get a blank screen
-                win.flip()
-        
-        # --- Ending Routine "pre_stim" ---
-        for thisComponent in pre_stimComponents:
-            if hasattr(thisComponent, "setAutoDraw"):
-                thisComponent.setAutoDraw(False)
-        thisExp.addData('pre_stim.stopped', globalClock.getTime())
-        # using non-slip timing so subtract the expected duration of this Routine (unless ended on request)
-        if routineForceEnded:
-            routineTimer.reset()
-        else:
-            routineTimer.addTime(-3.000000)
-        
-        # --- Prepare to start Routine "stim" ---
-        continueRoutine = True
-        # update component parameters for each repeat
-        thisExp.addData('stim.started', globalClock.getTime())
-        # Run 'Begin Routine' code from pupil_code
-        marker_outlet.push_sample([f"stim-{name}"])
-        sound_duration = current_sound.getDuration()
-        print(f'{name}: {sound_duration}')
-        current_sound.setSound(sound_path, hamming=True)
-        current_sound.setVolume(1.0, log=False)
-        current_sound.seek(0)
-        text_3.setText(name)
-        # keep track of which components have finished
-        stimComponents = [current_sound, text_3]
-        for thisComponent in stimComponents:
-            thisComponent.tStart = None
-            thisComponent.tStop = None
-            thisComponent.tStartRefresh = None
-            thisComponent.tStopRefresh = None
-            if hasattr(thisComponent, 'status'):
-                thisComponent.status = NOT_STARTED
-        # reset timers
-        t = 0
-        _timeToFirstFrame = win.getFutureFlipTime(clock="now")
-        frameN = -1
-        
-        # --- Run Routine "stim" ---
-        routineForceEnded = not continueRoutine
-        while continueRoutine:
-            # get current time
-            t = routineTimer.getTime()
-            tThisFlip = win.getFutureFlipTime(clock=routineTimer)
-            tThisFlipGlobal = win.getFutureFlipTime(clock=None)
-            frameN = frameN + 1  # number of completed frames (so 0 is the first frame)
-            # update/draw components on each frame
-            
-            # if current_sound is starting this frame...
-            if current_sound.status == NOT_STARTED and tThisFlip >= 0.0-frameTolerance:
-                # keep track of start time/frame for later
-                current_sound.frameNStart = frameN  # exact frame index
-                current_sound.tStart = t  # local t and not account for scr refresh
-                current_sound.tStartRefresh = tThisFlipGlobal  # on global time
-                # add timestamp to datafile
-                thisExp.addData('current_sound.started', tThisFlipGlobal)
-                # update status
-                current_sound.status = STARTED
-                current_sound.play(when=win)  # sync with win flip
-            # update current_sound status according to whether it's playing
-            if current_sound.isPlaying:
-                current_sound.status = STARTED
-            elif current_sound.isFinished:
-                current_sound.status = FINISHED
-            
-            # *text_3* updates
-            
-            # if text_3 is starting this frame...
-            if text_3.status == NOT_STARTED and tThisFlip >= 0.0-frameTolerance:
-                # keep track of start time/frame for later
-                text_3.frameNStart = frameN  # exact frame index
-                text_3.tStart = t  # local t and not account for scr refresh
-                text_3.tStartRefresh = tThisFlipGlobal  # on global time
-                win.timeOnFlip(text_3, 'tStartRefresh')  # time at next scr refresh
-                # add timestamp to datafile
-                thisExp.timestampOnFlip(win, 'text_3.started')
-                # update status
-                text_3.status = STARTED
-                text_3.setAutoDraw(True)
-            
-            # if text_3 is active this frame...
-            if text_3.status == STARTED:
-                # update params
-                pass
-            
-            # if text_3 is stopping this frame...
-            if text_3.status == STARTED:
-                # is it time to stop? (based on global clock, using actual start)
-                if tThisFlipGlobal > text_3.tStartRefresh + sound_duration-frameTolerance:
-                    # keep track of stop time/frame for later
-                    text_3.tStop = t  # not accounting for scr refresh
-                    text_3.frameNStop = frameN  # exact frame index
-                    # add timestamp to datafile
-                    thisExp.timestampOnFlip(win, 'text_3.stopped')
-                    # update status
-                    text_3.status = FINISHED
-                    text_3.setAutoDraw(False)
-            
-            # check for quit (typically the Esc key)
-            if defaultKeyboard.getKeys(keyList=["escape"]):
-                thisExp.status = FINISHED
-            if thisExp.status == FINISHED or endExpNow:
-                endExperiment(thisExp, inputs=inputs, win=win)
-                return
-            
-            # check if all components have finished
-            if not continueRoutine:  # a component has requested a forced-end of Routine
-                routineForceEnded = True
-                break
-            continueRoutine = False  # will revert to True if at least one component still running
-            for thisComponent in stimComponents:
-                if hasattr(thisComponent, "status") and thisComponent.status != FINISHED:
-                    continueRoutine = True
-                    break  # at least one component has not yet finished
-            
-            # refresh the screen
-            if continueRoutine:  # don't flip if this routine is over or we'll get a blank screen
-                win.flip()
-        
-        # --- Ending Routine "stim" ---
-        for thisComponent in stimComponents:
-            if hasattr(thisComponent, "setAutoDraw"):
-                thisComponent.setAutoDraw(False)
-        thisExp.addData('stim.stopped', globalClock.getTime())
-        # Run 'End Routine' code from pupil_code
-        marker_outlet.push_sample([f"poststim-{name}"])
-        post_duration = pupil_duration - sound_duration
-        
-        current_sound.pause()  # ensure sound has stopped at end of Routine
-        # the Routine "stim" was not non-slip safe, so reset the non-slip timer
-        routineTimer.reset()
-        
-        # --- Prepare to start Routine "post_stim" ---
-        continueRoutine = True
-        # update component parameters for each repeat
-        thisExp.addData('post_stim.started', globalClock.getTime())
-        # keep track of which components have finished
-        post_stimComponents = [cross_2]
-        for thisComponent in post_stimComponents:
-            thisComponent.tStart = None
-            thisComponent.tStop = None
-            thisComponent.tStartRefresh = None
-            thisComponent.tStopRefresh = None
-            if hasattr(thisComponent, 'status'):
-                thisComponent.status = NOT_STARTED
-        # reset timers
-        t = 0
-        _timeToFirstFrame = win.getFutureFlipTime(clock="now")
-        frameN = -1
-        
-        # --- Run Routine "post_stim" ---
-        routineForceEnded = not continueRoutine
-        while continueRoutine:
-            # get current time
-            t = routineTimer.getTime()
-            tThisFlip = win.getFutureFlipTime(clock=routineTimer)
-            tThisFlipGlobal = win.getFutureFlipTime(clock=None)
-            frameN = frameN + 1  # number of completed frames (so 0 is the first frame)
-            # update/draw components on each frame
-            
-            # *cross_2* updates
-            
-            # if cross_2 is starting this frame...
-            if cross_2.status == NOT_STARTED and tThisFlip >= 0.0-frameTolerance:
-                # keep track of start time/frame for later
-                cross_2.frameNStart = frameN  # exact frame index
-                cross_2.tStart = t  # local t and not account for scr refresh
-                cross_2.tStartRefresh = tThisFlipGlobal  # on global time
-                win.timeOnFlip(cross_2, 'tStartRefresh')  # time at next scr refresh
-                # add timestamp to datafile
-                thisExp.timestampOnFlip(win, 'cross_2.started')
-                # update status
-                cross_2.status = STARTED
-                cross_2.setAutoDraw(True)
-            
-            # if cross_2 is active this frame...
-            if cross_2.status == STARTED:
-                # update params
-                pass
-            
-            # if cross_2 is stopping this frame...
-            if cross_2.status == STARTED:
-                # is it time to stop? (based on global clock, using actual start)
-                if tThisFlipGlobal > cross_2.tStartRefresh + post_duration-frameTolerance:
-                    # keep track of stop time/frame for later
-                    cross_2.tStop = t  # not accounting for scr refresh
-                    cross_2.frameNStop = frameN  # exact frame index
-                    # add timestamp to datafile
-                    thisExp.timestampOnFlip(win, 'cross_2.stopped')
-                    # update status
-                    cross_2.status = FINISHED
-                    cross_2.setAutoDraw(False)
-            
-            # check for quit (typically the Esc key)
-            if defaultKeyboard.getKeys(keyList=["escape"]):
-                thisExp.status = FINISHED
-            if thisExp.status == FINISHED or endExpNow:
-                endExperiment(thisExp, inputs=inputs, win=win)
-                return
-            
-            # check if all components have finished
-            if not continueRoutine:  # a component has requested a forced-end of Routine
-                routineForceEnded = True
-                break
-            continueRoutine = False  # will revert to True if at least one component still running
-            for thisComponent in post_stimComponents:
-                if hasattr(thisComponent, "status") and thisComponent.status != FINISHED:
-                    continueRoutine = True
-                    break  # at least one component has not yet finished
-            
-            # refresh the screen
-            if continueRoutine:  # don't flip if this routine is over or we'll get a blank screen
-                win.flip()
-        
-        # --- Ending Routine "post_stim" ---
-        for thisComponent in post_stimComponents:
-            if hasattr(thisComponent, "setAutoDraw"):
-                thisComponent.setAutoDraw(False)
-        thisExp.addData('post_stim.stopped', globalClock.getTime())
-        # Run 'End Routine' code from code_increment
-        if sound_idx < len(sound_files)-1:
-            sound_idx+=1
-        else:
-            sound_files = 0
-        # the Routine "post_stim" was not non-slip safe, so reset the non-slip timer
-        routineTimer.reset()
-        thisExp.nextEntry()
-        
-        if thisSession is not None:
-            # if running in a Session with a Liaison client, send data up to now
-            thisSession.sendExperimentData()
-    # completed n_trials repeats of 'trials'
+    # --- Routines and loops of the experiment, in order ---
+    experiment = [
+        Routine('welcome', [text_2], response=KeyResponse(key_resp, 'key_resp')),
+        Routine('black', [black_screen_2], range_time, marker="range-black"),
+        Routine('gray', [gray_screen], range_time, marker="range-gray"),
+        Loop('trials', [
+            Routine('pre_stim', [cross], 3.0, marker="pre-stim-{name}"),
+            # the name of the sound is shown while it plays
+            Routine('stim', [text_3], lambda trial: trial['sound_duration'], sound=current_sound,
+                    sound_marker="stim-{name}", begin=lambda trial: text_3.setText(trial['name'])),
+            Routine('post_stim', [cross], lambda trial: pupil_duration - trial['sound_duration'],
+                    marker="poststim-{name}"),
+        ], trials),
+    ]
+    engine = TrialEngine(win, thisExp, expInfo, marker_outlet, defaultKeyboard, routineTimer, globalClock,
+                         functools.partial(endExperiment, inputs=inputs),
+                         functools.partial(pauseExperiment, inputs=inputs),
+                         session=thisSession, frame_tolerance=frameTolerance)
+    if not engine.run(experiment):
+        return
     
     # Run 'End Experiment' code from code_init
-    if started_recording:
-        lsl_socket.sendall(b"stop\n")
-        started_recording = False
+    cleanup()
     
     
     # mark experiment as finished
@@ -1172,11 +529,15 @@ if __name__ == '__main__':
     logFile = setupLogging(filename=thisExp.dataFileName)
     win = setupWindow(expInfo=expInfo)
     inputs = setupInputs(expInfo=expInfo, thisExp=thisExp, win=win)
-    run(
-        expInfo=expInfo, 
-        thisExp=thisExp, 
-        win=win, 
-        inputs=inputs
-    )
-    saveData(thisExp=thisExp)
+    try:
+        run(
+            expInfo=expInfo, 
+            thisExp=thisExp, 
+            win=win, 
+            inputs=inputs
+        )
+        saveData(thisExp=thisExp)
+    finally:
+        # also when Esc ends the session early or run() raises
+        cleanup()
     quit(thisExp=thisExp, win=win, inputs=inputs)
@@ -0,0 +1,167 @@
+import hashlib
+import json
+import os
+import pickle
+import types
+
+
+def file_key(file_path):
+    """Identify an input file by path, size and modification time"""
+    stat = os.stat(file_path)
+    return f"{os.path.abspath(file_path)}|{stat.st_size}|{stat.st_mtime_ns}"
+
+
+def code_version(func):
+    """
+    Hash of the bytecode of func and of every function from the same source
+    directory it calls, directly or through its closure, so editing a stage or
+    one of the repo helpers it uses gives the stage a new key. Comments and
+    line numbers are not part of the bytecode and do not invalidate anything.
+    """
+    root = os.path.dirname(os.path.abspath(func.__code__.co_filename))
+    digest = hashlib.sha1()
+    seen = set()
+
+    def local(value):
+        return (isinstance(value, types.FunctionType) and
+                os.path.dirname(os.path.abspath(value.__code__.co_filename)) == root)
+
+    def add_function(function):
+        if function in seen:
+            return
+        seen.add(function)
+        add_code(function.__code__, function.__globals__)
+        for cell in function.__closure__ or ():
+            try:
+                value = cell.cell_contents
+            except ValueError:
+                continue  # not assigned yet
+            if local(value):
+                add_function(value)
+
+    def add_code(code, namespace):
+        digest.update(code.co_code)
+        digest.update(repr(code.co_names).encode('utf-8'))
+        for const in code.co_consts:
+            if isinstance(const, types.CodeType):
+                add_code(const, namespace)
+            elif isinstance(const, frozenset):
+                # set order depends on the hash seed of the interpreter
+                digest.update(repr(sorted(map(repr, const))).encode('utf-8'))
+            else:
+                digest.update(repr(const).encode('utf-8'))
+        for name in code.co_names:
+            if local(namespace.get(name)):
+                add_function(namespace[name])
+
+    add_function(func)
+    return digest.hexdigest()
+
+
+class StageCache:
+    """
+    On-disk memoization of pipeline stages.
+    Each stage result is stored under a hash of the stage name, its parameters,
+    its code (see code_version) and the key of the stage it was computed from, so
+    changing a parameter or the stage's code only invalidates that stage and
+    everything downstream of it. Bump a stage's version for changes the code hash
+    cannot see, e.g. a new mne release computing something differently. When max_bytes is set,
+    the least recently used results are deleted once the cache grows past it.
+    With root=None every stage is simply computed.
+    """
+
+    def __init__(self, root, max_bytes=None):
+        self.root = root
+        self.max_bytes = max_bytes
+        if root is not None:
+            os.makedirs(root, exist_ok=True)
+
+    def key(self, stage, params, parent=None, code=None, version=1):
+        desc = json.dumps({'stage': stage, 'params': params, 'parent': parent,
+                           'code': code, 'version': version},
+                          sort_keys=True, default=repr)
+        return hashlib.sha1(desc.encode('utf-8')).hexdigest()
+
+    def stage(self, name, params, compute, parent=None, version=1):
+        """
+        Declare a pipeline stage. parent is the upstream Stage (or a file_key for
+        the first stage). Nothing is loaded or computed until Stage.get is called,
+        so stages upstream of a cached result are never touched.
+        """
+        if isinstance(parent, Stage):
+            parent = parent.key
+        key = self.key(name, params, parent, code=code_version(compute), version=version)
+        return Stage(self, name, key, compute)
+
+    def load_or_compute(self, name, key, compute):
+        if self.root is None:
+            return compute()
+
+        path = os.path.join(self.root, f"{name}-{key}.pkl")
+        try:
+            with open(path, 'rb') as f:
+                result = pickle.load(f)
+            os.utime(path)  # mark as recently used
+            print(f"{name}: loaded from cache")
+            return result
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+            pass
+
+        result = compute()
+        tmp_path = f"{path}.tmp{os.getpid()}"
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+        self.evict(keep=path)
+        return result
+
+    def evict(self, keep=None):
+        """Delete least recently used results until the cache fits in max_bytes"""
+        if self.root is None or self.max_bytes is None:
+            return
+        entries = []
+        for entry in os.scandir(self.root):
+            if entry.name.endswith('.pkl'):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass  # removed by another process sharing the cache
+            total -= size
+
+
+class Stage:
+    """A lazily evaluated, cached pipeline stage created by StageCache.stage"""
+
+    def __init__(self, cache, name, key, compute):
+        self.cache = cache
+        self.name = name
+        self.key = key
+        self.compute = compute
+        self._result = None
+        self._done = False
+
+    def get(self):
+        if not self._done:
+            self._result = self.cache.load_or_compute(self.name, self.key, self.compute)
+            self._done = True
+        return self._result
+
+
+def add_cache_arguments(parser):
+    parser.add_argument('--cache_dir', default=os.path.join("processed", ".cache"), help="directory of the pipeline stage cache")
+    parser.add_argument('--cache_gb', type=float, default=20, help="size cap of the stage cache in GB, least recently used stages are evicted first")
+    parser.add_argument('--no_cache', action='store_true', help="recompute every stage and do not cache the results")
+
+
+def cache_from_args(cmd_args):
+    if cmd_args.no_cache:
+        return StageCache(None)
+    return StageCache(cmd_args.cache_dir, max_bytes=int(cmd_args.cache_gb * 1024 ** 3))
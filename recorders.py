@@ -0,0 +1,503 @@
+import os
+import platform
+import queue
+import struct
+import subprocess
+import sys
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from multiprocessing import resource_tracker, shared_memory
+import numpy as np
+from pylsl import StreamInfo, StreamOutlet, local_clock
+from frame_index import FrameIndexWriter, sidecar_path
+
+# capture thread -> encoder: ring slot, frame number, wall clock and LSL time of the frame
+FRAME_RECORD = struct.Struct('<iqdd')
+# encoder -> capture thread: ring slot that is free again
+SLOT_RECORD = struct.Struct('<i')
+
+
+class FrameRing:
+    """A fixed number of preallocated frame slots in shared memory"""
+
+    def __init__(self, n_slots, shape, name=None):
+        size = int(n_slots * np.prod(shape))
+        self.owner = name is None
+        self.shm = shared_memory.SharedMemory(name=name, create=self.owner, size=size)
+        if not self.owner and sys.version_info < (3, 13):
+            # only the creating process may unlink the block, see bpo-39959
+            resource_tracker.unregister(self.shm._name, 'shared_memory')
+        self.frames = np.ndarray((n_slots,) + tuple(shape), np.uint8, buffer=self.shm.buf)
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def close(self):
+        del self.frames
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+def run_encoder(shm_name, n_slots, shape, output_path, fps, display_video=False):
+    """
+    Encoder process: takes filled slots from stdin, stamps and encodes them, and
+    returns each slot on stdout once the frame is written. The LSL time of every
+    written frame goes to the frame index sidecar next to the video. Messages go
+    to stderr, stdout carries only the slot protocol.
+    """
+    import cv2
+    ring = FrameRing(n_slots, shape, shm_name)
+    out = cv2.VideoWriter(output_path, cv2.VideoWriter_fourcc(*'XVID'), fps,
+                          (shape[1], shape[0]))
+    frame_index = FrameIndexWriter(sidecar_path(output_path), fps)
+    stdin, stdout = sys.stdin.buffer, sys.stdout.buffer
+    try:
+        while True:
+            record = stdin.read(FRAME_RECORD.size)
+            if len(record) < FRAME_RECORD.size:
+                break
+            slot, _, wall_time, lsl_time = FRAME_RECORD.unpack(record)
+            if slot < 0:
+                break
+            frame = ring.frames[slot]
+            timestamp = datetime.fromtimestamp(wall_time).strftime("%Y-%m-%d %H:%M:%S.%f")
+            cv2.putText(frame, timestamp, (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
+            out.write(frame)
+            frame_index.append(lsl_time)
+            if display_video:
+                cv2.imshow('frame', frame)
+                cv2.waitKey(1)
+            stdout.write(SLOT_RECORD.pack(slot))
+            stdout.flush()
+    finally:
+        out.release()
+        frame_index.close()
+        if display_video:
+            cv2.destroyAllWindows()
+        ring.close()
+
+
+class DeviceClock:
+    """
+    Maps device timestamps (e.g. the driver's buffer time of a camera frame) onto
+    the LSL clock. The offset is the smallest LSL minus device difference seen over
+    the last window samples, i.e. the sample least delayed by transfer and scheduling,
+    which also follows slow drift between the clocks.
+    """
+
+    def __init__(self, window=300):
+        self.differences = deque(maxlen=window)
+        self.last_device_time = None
+
+    def map(self, device_time, receive_time):
+        """LSL time of a device timestamp, or None if the device time is unusable"""
+        if device_time <= 0 or (self.last_device_time is not None
+                                and device_time <= self.last_device_time):
+            return None
+        self.last_device_time = device_time
+        self.differences.append(receive_time - device_time)
+        return device_time + min(self.differences)
+
+
+class VideoEncoderError(RuntimeError):
+    pass
+
+
+class DeviceOpenError(RuntimeError):
+    pass
+
+
+class VideoRecorder:
+    """
+    Records a camera to an XVID .avi file with a frame counter LSL stream.
+    record_video runs the capture loop, which only grabs frames into a ring of
+    preallocated shared memory slots and pushes their LSL timestamps. Stamping
+    the time onto the frame, encoding and display happen in a separate encoder
+    process, so an encoder stall or a busy PsychoPy process does not hold up
+    the camera. If the encoder falls behind by more than ring_slots frames, new
+    frames are counted in dropped_frames instead of blocking the capture.
+    late_frames counts frames that arrived more than 1.5 frame periods after
+    the previous one, i.e. frames lost by the camera or driver.
+    The VideoStream sample of a frame is its index in the .avi file, stamped with
+    the driver's capture time mapped onto the LSL clock where the backend reports
+    one, else with local_clock() right after the grab. Samples are pushed in chunks
+    of chunk_frames. The same timestamps are written to a frame index sidecar
+    (see frame_index.py) next to the video. If the encoder process dies,
+    record_video stops and raises VideoEncoderError.
+    The video and the stream run at default_fps, or with camera_fps=True at the
+    rate the camera reports; the stream is then only created by open(), which
+    acquisition.run_worker calls before it reports the recorder ready.
+    open() raises DeviceOpenError if the camera cannot be opened; record_video
+    calls it itself if it has not been called yet.
+    """
+
+    def __init__(self, cam_id=0, output_path='output.avi', default_fps=30, display_video=False,
+                 enable_lsl=False, ring_slots=64, chunk_frames=8, camera_fps=False):
+        print("VideoRecorder start.")
+        self.cam_id = cam_id
+        self.output_path = output_path
+        self.display_video = display_video
+        self.enable_lsl = enable_lsl
+        self.default_fps = default_fps
+        self.camera_fps = camera_fps
+        self.ring_slots = ring_slots
+        self.chunk_frames = chunk_frames
+        self.cap = None
+        self.fps = default_fps
+        self.encoder = None
+        self.ring = None
+        self.video_outlet = None
+        self.stop_event = threading.Event()
+        self.frames_captured = 0
+        self.frames_written = 0
+        self.dropped_frames = 0
+        self.late_frames = 0
+        self.driver_timestamps = False
+        if self.enable_lsl and not camera_fps:
+            # created here so the stream exists before LabRecorder is told to select all streams
+            self.video_outlet = self._create_outlet(self.default_fps)
+        print("VideoRecorder initialized successfully.")
+
+    def _create_outlet(self, fps):
+        info = StreamInfo('VideoStream', 'Video', 1, fps, 'float32', 'videouid34234')
+        return StreamOutlet(info)
+
+    def signal_handler(self, sig, frame):
+        print('Termination signal received. Releasing resources...')
+        self.stop()
+        sys.exit(0)
+
+    def stop(self):
+        self.stop_event.set()
+
+    def stats(self):
+        return {'captured': self.frames_captured, 'written': self.frames_written,
+                'dropped': self.dropped_frames, 'late': self.late_frames,
+                'driver_timestamps': self.driver_timestamps}
+
+    def release_resources(self):
+        if self.cap:
+            self.cap.release()
+        if self.encoder:
+            try:
+                self.encoder.stdin.write(FRAME_RECORD.pack(-1, 0, 0.0, 0.0))
+                self.encoder.stdin.close()
+            except (BrokenPipeError, OSError):
+                pass
+            try:
+                self.encoder.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                self.encoder.kill()
+        if self.ring:
+            self.ring.close()
+            self.ring = None
+
+    def _start_encoder(self, shape, fps):
+        self.ring = FrameRing(self.ring_slots, shape)
+        # a fresh interpreter rather than multiprocessing, which would re-import the
+        # calling experiment script (and open its LSL outlets again) in the child
+        self.encoder = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), self.ring.name, str(self.ring_slots),
+             ",".join(map(str, shape)), self.output_path, str(fps), str(int(self.display_video))],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, bufsize=0)
+        free_slots = queue.Queue()
+        for slot in range(self.ring_slots):
+            free_slots.put(slot)
+
+        def collect_free_slots():
+            while True:
+                record = self.encoder.stdout.read(SLOT_RECORD.size)
+                if len(record) < SLOT_RECORD.size:
+                    return
+                free_slots.put(SLOT_RECORD.unpack(record)[0])
+                self.frames_written += 1
+        threading.Thread(target=collect_free_slots, daemon=True).start()
+        return free_slots
+
+    def _check_encoder(self):
+        code = self.encoder.poll()
+        if code is not None:
+            raise VideoEncoderError(f"video encoder exited with code {code} after "
+                                    f"{self.frames_written} of {self.frames_captured} frames")
+
+    def _push_frames(self, frame_numbers, timestamps):
+        if self.video_outlet and frame_numbers:
+            self.video_outlet.push_chunk(frame_numbers, timestamps)
+
+    def open(self):
+        import cv2
+        backend = cv2.CAP_DSHOW if platform.system() == 'Windows' else cv2.CAP_ANY
+        self.cap = cv2.VideoCapture(self.cam_id, backend)
+        if not self.cap.isOpened():
+            self.cap.release()
+            self.cap = None
+            raise DeviceOpenError(f"cannot open camera {self.cam_id}")
+        self.fps = self.default_fps
+        if self.camera_fps:
+            self.fps = self.cap.get(cv2.CAP_PROP_FPS) or self.default_fps
+            print(f"fps: {self.fps}")
+            if self.enable_lsl:
+                self.video_outlet = self._create_outlet(self.fps)
+
+    def record_video(self):
+        import cv2
+        if self.cap is None:
+            self.open()
+        fps = self.fps
+        ret, frame = self.cap.read()
+        if not ret:
+            print("No frame received.")
+            self.release_resources()
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.output_path)), exist_ok=True)
+        free_slots = self._start_encoder(frame.shape, fps)
+        scratch = np.empty_like(frame)
+        late_interval = 1.5 / fps
+        driver_clock = DeviceClock()
+        chunk_numbers, chunk_stamps = [], []
+
+        frame_number = 0
+        last_grab = None
+        try:
+            while self.cap.isOpened() and not self.stop_event.is_set():
+                # a dead encoder never returns its slots, which would look like dropped frames
+                self._check_encoder()
+                try:
+                    slot = free_slots.get_nowait()
+                    target = self.ring.frames[slot]
+                except queue.Empty:
+                    slot = None
+                    target = scratch
+                ret, frame = self.cap.read(target)
+                grab_time = local_clock()
+                wall_time = time.time()
+                # buffer timestamp of the driver in ms, 0 or not monotonic on backends without one
+                driver_time = driver_clock.map(self.cap.get(cv2.CAP_PROP_POS_MSEC) / 1000, grab_time)
+                self.driver_timestamps = driver_time is not None
+                if driver_time is not None:
+                    grab_time = driver_time
+                if not ret:
+                    print("No frame received.")
+                    if slot is not None:
+                        free_slots.put(slot)
+                    break
+                self.frames_captured += 1
+                if last_grab is not None and grab_time - last_grab > late_interval:
+                    self.late_frames += 1
+                last_grab = grab_time
+                if slot is None:
+                    self.dropped_frames += 1
+                    continue
+                if not np.shares_memory(frame, target):
+                    target[...] = frame
+
+                self.encoder.stdin.write(FRAME_RECORD.pack(slot, frame_number, wall_time, grab_time))
+                chunk_numbers.append([frame_number])
+                chunk_stamps.append(grab_time)
+                if len(chunk_numbers) >= self.chunk_frames:
+                    self._push_frames(chunk_numbers, chunk_stamps)
+                    chunk_numbers, chunk_stamps = [], []
+                frame_number += 1
+        except BrokenPipeError:
+            try:
+                self.encoder.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                pass
+            self._check_encoder()
+            raise
+        finally:
+            self._push_frames(chunk_numbers, chunk_stamps)
+            self.release_resources()
+            print(f"VideoRecorder stopped: {self.stats()}")
+
+
+def parse_ppg_lines(data):
+    """
+    Parse a block of complete "<label> <value>" lines from the PPG board in one
+    vectorized step. Lines that do not have exactly two fields are skipped.
+    Returns: float64 array of values
+    """
+    lines = np.char.strip(np.array(data.decode('utf-8', errors='replace').split('\n')))
+    label, sep, value = np.char.partition(lines, ' ').T
+    valid = (sep == ' ') & (value != '') & (np.char.find(value, ' ') < 0)
+    try:
+        return value[valid].astype(float)
+    except ValueError:
+        # a garbled value, e.g. after a partial line at connection start
+        return np.array([float(v) for v in value[valid] if _is_float(v)])
+
+
+def _is_float(text):
+    try:
+        float(text)
+        return True
+    except ValueError:
+        return False
+
+
+class SampleClock:
+    """
+    Timestamps for samples of a fixed rate device that arrive in batches.
+    Samples are spaced exactly 1/rate apart, continuing from the previous batch.
+    If that would stamp the newest sample after the time it was received (the
+    device runs faster than nominal), the batch is spread evenly up to the
+    receive time instead. After a gap of more than max_lag the stamps are
+    re-anchored on the receive time, back-dated from the newest sample. Either
+    way no stamp comes before the previous one or after the receive time.
+    """
+
+    def __init__(self, rate, max_lag=0.5):
+        self.rate = rate
+        self.max_lag = max_lag
+        self.last = None
+
+    def timestamps(self, n, receive_time):
+        steps = np.arange(1, n + 1) / self.rate
+        if self.last is None:
+            stamps = receive_time - steps[::-1] + 1 / self.rate
+        elif receive_time - (self.last + steps[-1]) > self.max_lag:
+            stamps = receive_time - steps[::-1] + 1 / self.rate
+            # a late batch of many samples must not reach back before the previous one
+            stamps = np.maximum(stamps, self.last + steps)
+        else:
+            stamps = self.last + steps
+            if stamps[-1] > receive_time:
+                stamps = self.last + (receive_time - self.last) * np.arange(1, n + 1) / n
+        self.last = stamps[-1]
+        return stamps
+
+
+class PPGRecorder:
+    """
+    Reads the PPG board over serial and pushes it to the PPGStream LSL outlet.
+    record_ppg drains everything waiting in the serial buffer at once, parses all
+    complete lines together and pushes them as one chunk, with per-sample
+    timestamps from the nominal sample rate (see SampleClock) instead of the time
+    each line happened to be read. With csv_path the samples are also written to
+    a CSV file (Datetime, Timestamp, Signal), a batch at a time.
+    open() connects to the serial port and raises DeviceOpenError if it cannot;
+    start calls it itself if it has not been called yet.
+    """
+
+    def __init__(self, port, baud_rate=115200, enable_lsl=True, simulate_data=False,
+                 csv_path=None, sample_rate=50):
+        self.port = port
+        self.baud_rate = baud_rate
+        self.enable_lsl = enable_lsl
+        self.simulate_data = simulate_data
+        self.csv_path = csv_path
+        self.ser = None
+        self.stop_event = threading.Event()
+        self.sample_rate = sample_rate
+        self.ppg_outlet = None
+        self.samples_received = 0
+
+        if self.enable_lsl:
+            info = StreamInfo('PPGStream', 'PPG', 1, self.sample_rate,
+                              'float32', 'ppguid34234')
+            self.ppg_outlet = StreamOutlet(info)
+
+    def signal_handler(self, sig, frame):
+        print('Termination signal received. Releasing resources...')
+        self.stop()
+        sys.exit(0)
+
+    def open(self):
+        if self.simulate_data:
+            return
+        import serial
+        try:
+            self.ser = serial.Serial(self.port, self.baud_rate, timeout=1)
+        except serial.SerialException as e:
+            raise DeviceOpenError(f"cannot open {self.port}: {e}") from e
+        time.sleep(2)  # Wait for the connection to be established
+        print(f"Successfully connected to {self.port}")
+
+    def start(self):
+        if self.simulate_data:
+            self.simulate_ppg_data()
+            return
+        import serial
+        try:
+            if self.ser is None:
+                self.open()
+            self.record_ppg()
+        except (serial.SerialException, DeviceOpenError) as e:
+            print(f"Serial error: {e}")
+        except Exception as e:
+            print(f"An error occurred: {e}")
+        finally:
+            self.release_resources()
+
+    def stop(self):
+        self.stop_event.set()
+
+    def stats(self):
+        return {'received': self.samples_received}
+
+    def _open_csv(self):
+        if not self.csv_path:
+            return None
+        csv_file = open(self.csv_path, 'w', newline='', buffering=1024 * 1024)
+        csv_file.write("Datetime,Timestamp,Signal\n")
+        return csv_file
+
+    def _write_csv(self, csv_file, timestamps, values):
+        # LSL times to local wall clock times, formatted for the whole batch at once
+        wall = timestamps + (time.time() - local_clock())
+        local = wall + datetime.now().astimezone().utcoffset().total_seconds()
+        dates = np.datetime_as_string((local * 1e6).astype('datetime64[us]'), unit='us')
+        csv_file.write("".join(f"{date.replace('T', ' ')},{stamp:.6f},{value:g}\n"
+                               for date, stamp, value in zip(dates, wall, values)))
+
+    def record_ppg(self):
+        clock = SampleClock(self.sample_rate)
+        pending = bytearray()
+        csv_file = self._open_csv()
+        try:
+            while not self.stop_event.is_set():
+                # blocks until at least one byte arrives or the 1 s timeout passes
+                pending += self.ser.read(max(self.ser.in_waiting, 1))
+                receive_time = local_clock()
+                end = pending.rfind(b'\n')
+                if end < 0:
+                    if not pending:
+                        print("No signal received.")
+                    continue
+                values = parse_ppg_lines(bytes(pending[:end]))
+                del pending[:end + 1]
+                if len(values) == 0:
+                    continue
+                timestamps = clock.timestamps(len(values), receive_time)
+                self.samples_received += len(values)
+                if self.ppg_outlet:
+                    self.ppg_outlet.push_chunk(values[:, None].tolist(), timestamps.tolist())
+                if csv_file:
+                    self._write_csv(csv_file, timestamps, values)
+        finally:
+            if csv_file:
+                csv_file.close()
+
+    def simulate_ppg_data(self):
+        from synthetic_devices import SyntheticPPG
+        print("Simulating PPG data.")
+        if not self.ppg_outlet:
+            self.stop_event.wait()
+            return
+        SyntheticPPG(self.sample_rate, outlet=self.ppg_outlet).run(self.stop_event)
+
+    def release_resources(self):
+        if self.ser and self.ser.is_open:
+            self.ser.close()
+            print(f"Closed connection to {self.port}")
+
+
+if __name__ == "__main__":
+    # encoder process started by VideoRecorder._start_encoder
+    shm_name, n_slots, shape, output_path, fps, display_video = sys.argv[1:7]
+    run_encoder(shm_name, int(n_slots), tuple(int(n) for n in shape.split(",")),
+                output_path, float(fps), display_video == "1")
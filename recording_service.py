@@ -0,0 +1,252 @@
+import argparse
+import os
+import re
+import socketserver
+import threading
+import time
+import numpy as np
+from pylsl import StreamInlet, local_clock, resolve_streams
+from labrecorder import RCS_PORT, TEMPLATE_FIELDS, recording_path
+from xdf_io import NUMERIC_FORMATS, XDFWriter, parse_stream_header
+
+DEFAULT_TEMPLATE = os.path.join("sub-%p", "sub-%p_task-%b_run-%n.xdf")
+
+
+def setup_parser():
+    parser = argparse.ArgumentParser(
+                    prog='recording_service',
+                    description='record all LSL streams to XDF, controlled over the LabRecorder remote control protocol',
+                    epilog='a headless stand-in for LabRecorder: hearing.py, passive.py and labrecorder.LabRecorderClient work with it unchanged. Supports update, select all, select none, filename {...}, start and stop')
+    parser.add_argument('-p', '--port', type=int, default=RCS_PORT, help="remote control port")
+    parser.add_argument('--root', default=os.path.join(os.getcwd(), "exp_data"), help="study root, used when the filename command does not set one")
+    parser.add_argument('--template', default=DEFAULT_TEMPLATE, help="file name template, %%p participant, %%b task, %%n run, %%s session")
+    parser.add_argument('--flush', type=float, default=0.5, help="seconds of samples buffered per stream before a chunk is written")
+    parser.add_argument('--resolve_time', type=float, default=1.0, help="seconds the update command waits for streams")
+    return parser
+
+
+class StreamRecorder(threading.Thread):
+    """
+    Pulls one LSL stream and writes it to the recording, one Samples chunk per
+    flush_interval seconds, with a clock offset measurement every clock_interval
+    seconds like LabRecorder. Timestamps are stored in the sender's clock,
+    pyxdf (or utils.parse_xdf) synchronizes them with the offsets.
+    """
+
+    def __init__(self, info, stream_id, writer, write_lock, flush_interval=0.5, clock_interval=5.0):
+        super().__init__(daemon=True)
+        self.inlet = StreamInlet(info, max_buflen=360, recover=True)
+        xml = self.inlet.info(timeout=5.0).as_xml()
+        header = parse_stream_header(xml.encode('utf-8'))
+        self.name = header['name']
+        self.channel_count = header['channel_count']
+        self.dtype = NUMERIC_FORMATS.get(header['channel_format'])
+        self.stream_id = stream_id
+        self.writer = writer
+        self.write_lock = write_lock
+        self.flush_interval = flush_interval
+        self.clock_interval = clock_interval
+        self.stop_event = threading.Event()
+        self.pending_values, self.pending_stamps = [], []
+        self.sample_count = 0
+        self.write_seconds = 0.0
+        with write_lock:
+            writer.add_stream_xml(stream_id, xml)
+        self.inlet.open_stream(timeout=5.0)
+
+    def pull(self, timeout):
+        if self.dtype is None:
+            values, stamps = self.inlet.pull_chunk(timeout=timeout)
+            self.pending_values.extend(values)
+        else:
+            # pull straight into a preallocated array instead of lists of Python floats
+            _, stamps = self.inlet.pull_chunk(timeout=timeout, max_samples=len(self.buffer),
+                                              dest_obj=self.buffer)
+            if stamps:
+                self.pending_values.append(self.buffer[:len(stamps)].copy())
+        self.pending_stamps.extend(stamps)
+        return len(stamps)
+
+    def flush(self):
+        if not self.pending_stamps:
+            return
+        values = self.pending_values if self.dtype is None else np.concatenate(self.pending_values)
+        start = time.perf_counter()
+        with self.write_lock:
+            self.writer.write_samples(self.stream_id, values, self.pending_stamps)
+        self.write_seconds += time.perf_counter() - start
+        self.sample_count += len(self.pending_stamps)
+        self.pending_values, self.pending_stamps = [], []
+
+    def write_clock_offset(self):
+        try:
+            offset = self.inlet.time_correction(timeout=2.0)
+        except RuntimeError as e:
+            # pylsl's TimeoutError and LostError; the next measurement may succeed
+            print(f"{self.name}: clock offset skipped, {e}")
+            return
+        with self.write_lock:
+            self.writer.write_clock_offset(self.stream_id, local_clock() - offset, offset)
+
+    def run(self):
+        if self.dtype is not None:
+            self.buffer = np.empty((1024, self.channel_count), dtype=self.dtype)
+        self.write_clock_offset()
+        last_flush = last_clock = time.monotonic()
+        while not self.stop_event.is_set():
+            self.pull(timeout=0.05)
+            now = time.monotonic()
+            if now - last_flush >= self.flush_interval:
+                self.flush()
+                last_flush = now
+            if now - last_clock >= self.clock_interval:
+                self.write_clock_offset()
+                last_clock = now
+        # samples that arrived before stop
+        while self.pull(timeout=0.0):
+            pass
+        self.flush()
+        self.write_clock_offset()
+        self.inlet.close_stream()
+
+    def stop(self):
+        self.stop_event.set()
+
+
+class RecordingService:
+    """Executes remote control commands, one recording at a time"""
+
+    def __init__(self, root, template=DEFAULT_TEMPLATE, flush_interval=0.5, resolve_time=1.0):
+        self.settings = {'root': root, 'template': template}
+        self.fields = {}
+        self.flush_interval = flush_interval
+        self.resolve_time = resolve_time
+        self.available, self.selected = [], []
+        self.writer, self.recorders = None, []
+        self.lock = threading.Lock()
+
+    def handle(self, line):
+        command, _, argument = line.strip().partition(' ')
+        with self.lock:
+            if command == 'update':
+                self.update()
+            elif command == 'select':
+                self.selected = list(self.available) if argument == 'all' else []
+            elif command == 'filename':
+                self.set_filename(argument)
+            elif command == 'start':
+                self.start()
+            elif command == 'stop':
+                self.stop()
+            elif command:
+                print(f"unknown command: {line.strip()}")
+
+    def update(self):
+        self.available = resolve_streams(wait_time=self.resolve_time)
+        print(f"found streams: {', '.join(info.name() for info in self.available)}")
+
+    def set_filename(self, argument):
+        for key, value in re.findall(r'\{(\w+):([^}]*)\}', argument):
+            if key in TEMPLATE_FIELDS:
+                self.fields[key] = value
+            elif key in self.settings:
+                self.settings[key] = value
+            else:
+                print(f"ignoring filename setting {key}")
+
+    def start(self):
+        if self.writer:
+            print("already recording")
+            return
+        if not self.selected:
+            print("no streams selected, nothing to record")
+            return
+        path = recording_path(self.settings['root'], self.settings['template'], **self.fields)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        if os.path.exists(path):
+            # keep earlier recordings like LabRecorder does
+            base, ext = os.path.splitext(path)
+            n = 1
+            while os.path.exists(f"{base}_old{n}{ext}"):
+                n += 1
+            os.rename(path, f"{base}_old{n}{ext}")
+        writer = XDFWriter(path, buffering=1024 ** 2)
+        self.write_lock = threading.Lock()
+        recorders = []
+        try:
+            for stream_id, info in enumerate(self.selected, start=1):
+                recorders.append(StreamRecorder(info, stream_id, writer, self.write_lock, self.flush_interval))
+        except RuntimeError as e:
+            # e.g. a stream that went away since update; leave no half open recording behind
+            for recorder in recorders:
+                recorder.inlet.close_stream()
+            writer.close()
+            os.remove(path)
+            print(f"could not start recording, stream {info.name()}: {e}")
+            return
+        self.path = path
+        self.writer, self.recorders = writer, recorders
+        self.started = time.perf_counter()
+        for recorder in self.recorders:
+            recorder.start()
+        self.stop_event = threading.Event()
+        self.sync_thread = threading.Thread(target=self.sync, daemon=True)
+        self.sync_thread.start()
+        print(f"recording {len(self.recorders)} streams to {path}")
+
+    def sync(self, interval=1.0):
+        """Push the write buffer to disk every interval seconds, so the file can be watched while recording"""
+        while not self.stop_event.wait(interval):
+            with self.write_lock:
+                self.writer.flush()
+
+    def stop(self):
+        if not self.writer:
+            return
+        self.stop_event.set()
+        self.sync_thread.join()
+        for recorder in self.recorders:
+            recorder.stop()
+        for recorder in self.recorders:
+            recorder.join()
+        self.writer.close()
+        self.writer = None
+        self.report(time.perf_counter() - self.started)
+
+    def report(self, elapsed):
+        size = os.path.getsize(self.path)
+        write_seconds = sum(recorder.write_seconds for recorder in self.recorders)
+        print(f"wrote {self.path}: {size / 1024 ** 2:.2f} MB in {elapsed:.1f} s")
+        for recorder in self.recorders:
+            print(f"  {recorder.name:24s} {recorder.sample_count:9d} samples  {recorder.sample_count / elapsed:9.1f} Hz")
+        if write_seconds > 0:
+            print(f"  write throughput {size / 1024 ** 2 / write_seconds:.1f} MB/s, "
+                  f"{write_seconds / elapsed * 100:.2f}% of the recording time spent writing")
+
+
+class RemoteControlHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            self.server.service.handle(line.decode('utf-8', errors='replace'))
+
+
+def main():
+    parser = setup_parser()
+    cmd_args = parser.parse_args()
+    service = RecordingService(cmd_args.root, cmd_args.template, cmd_args.flush, cmd_args.resolve_time)
+    socketserver.ThreadingTCPServer.allow_reuse_address = True
+    server = socketserver.ThreadingTCPServer(('localhost', cmd_args.port), RemoteControlHandler)
+    server.daemon_threads = True
+    server.service = service
+    print(f"listening for remote control commands on port {cmd_args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        with service.lock:
+            service.stop()
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+import argparse
+import shutil
+import tempfile
+import threading
+import xml.etree.ElementTree as ET
+import numpy as np
+from pylsl import StreamInfo, StreamOutlet, local_clock
+from xdf_io import scan_xdf, stream_xdf
+
+
+def setup_parser():
+    parser = argparse.ArgumentParser(
+                    prog='replay',
+                    description='play a recorded XDF session back as live LSL streams, with the original timing',
+                    epilog='every stream is published with the name, type, channel count, format and channel description it was recorded with, and its nominal rate times the speed, so online consumers cannot tell it from a live session. Example: python replay.py exp_data/sub-01/sub-01_task-hearing_run-1.xdf -s 10')
+    parser.add_argument('file', help="XDF recording to replay")
+    parser.add_argument('-s', '--speed', type=float, default=1.0, help="speed-up factor, between 1 and 50")
+    parser.add_argument('-c', '--chunk_size', type=int, default=8, help="samples per push for regularly sampled streams, markers are always pushed one at a time")
+    parser.add_argument('-t', '--types', nargs='+', help="only replay streams of these types, e.g. Markers EEG")
+    parser.add_argument('--delay', type=float, default=2.0, help="seconds to wait after creating the outlets, so consumers can connect")
+    parser.add_argument('--loop', action='store_true', help="replay the session over and over until Ctrl+C")
+    parser.add_argument('--block_size', type=int, default=65536, help="samples per stream decoded at a time, see xdf_io.stream_xdf")
+    return parser
+
+
+def copy_desc(element, lsl_element):
+    """Copy an XML <desc> tree into a pylsl XMLElement"""
+    for child in element:
+        if len(child):
+            copy_desc(child, lsl_element.append_child(child.tag))
+        else:
+            lsl_element.append_child_value(child.tag, child.text or '')
+
+
+class StreamReplay:
+    """
+    Republishes one recorded stream. Sample i is pushed when the replay clock
+    reaches its recorded time, counted from the first sample of the session and
+    divided by speed, and stamped with that time, so the streams keep their
+    relative timing and rates scale with the speed. The outlet advertises the
+    recorded nominal rate times the speed, the rate consumers actually receive.
+    """
+
+    def __init__(self, stream, header_xml, chunk_size=8, speed=1.0):
+        info = stream['info']
+        self.name = info['name'][0]
+        self.srate = float(info['nominal_srate'][0])
+        self.speed = speed
+        self.values = stream['time_series']
+        self.timestamps = np.asarray(stream['time_stamps'])
+        self.string = info['channel_format'][0] == 'string'
+        # irregular streams (markers) keep the exact time of every sample
+        self.chunk_size = chunk_size if self.srate > 0 else 1
+        lsl_info = StreamInfo(self.name, info['type'][0], int(info['channel_count'][0]),
+                              self.srate * speed, info['channel_format'][0], info['source_id'][0])
+        desc = ET.fromstring(header_xml.decode('utf-8', errors='replace')).find('desc')
+        if desc is not None:
+            copy_desc(desc, lsl_info.desc())
+        self.outlet = StreamOutlet(lsl_info, chunk_size=self.chunk_size)
+        self.samples_sent = 0
+
+    def run(self, replay_start, session_start, stop_event):
+        n_samples = len(self.timestamps)
+        # replay clock time of every sample
+        times = replay_start + (self.timestamps - session_start) / self.speed
+        for start in range(0, n_samples, self.chunk_size):
+            stop = min(start + self.chunk_size, n_samples)
+            # a chunk goes out once its last sample is due
+            if stop_event.wait(max(0.0, times[stop - 1] - local_clock())):
+                return
+            if self.string:
+                values = self.values[start:stop]
+            else:
+                values = np.ascontiguousarray(self.values[start:stop])
+            self.outlet.push_chunk(values, times[start:stop].tolist())
+            self.samples_sent += stop - start
+
+
+def replay(streams, stop_event, offset=0.0):
+    """Replay all streams once, starting in offset seconds. Returns the replay duration"""
+    session_start = min(stream.timestamps[0] for stream in streams)
+    replay_start = local_clock() + offset
+    threads = [threading.Thread(target=stream.run, args=(replay_start, session_start, stop_event), daemon=True)
+               for stream in streams]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        while thread.is_alive():
+            thread.join(timeout=0.5)
+    return local_clock() - replay_start
+
+
+def main():
+    parser = setup_parser()
+    cmd_args = parser.parse_args()
+    if not 1 <= cmd_args.speed <= 50:
+        parser.error("--speed must be between 1 and 50")
+
+    work_dir = tempfile.mkdtemp(prefix='replay_')
+    try:
+        # decoded to memory-mapped files, so long sessions do not have to fit in memory
+        streams = stream_xdf(cmd_args.file, work_dir, cmd_args.block_size, cmd_args.types)
+        headers = scan_xdf(cmd_args.file)
+        streams = [StreamReplay(stream, headers[stream['info']['stream_id']]['xml'],
+                                cmd_args.chunk_size, cmd_args.speed)
+                   for stream in streams if len(stream['time_stamps'])]
+        if not streams:
+            parser.error(f"{cmd_args.file} has no samples to replay")
+        for stream in streams:
+            print(f"{stream.name}: {len(stream.timestamps)} samples at {stream.srate:g} Hz, published at {stream.srate * stream.speed:g} Hz")
+        stop_event = threading.Event()
+        offset = cmd_args.delay
+        try:
+            while True:
+                duration = replay(streams, stop_event, offset)
+                print(f"replayed {sum(stream.samples_sent for stream in streams)} samples in {duration:.1f} s "
+                      f"at {cmd_args.speed:g}x")
+                if not cmd_args.loop:
+                    break
+                offset = 0.0
+        except KeyboardInterrupt:
+            stop_event.set()
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+import json
+import os
+import shutil
+import tempfile
+import mne
+import numpy as np
+from mne.time_frequency import AverageTFR, AverageTFRArray
+
+MANIFEST = "manifest.json"
+
+
+def _flatten(tree, prefix=""):
+    for name, value in tree.items():
+        key = f"{prefix}/{name}" if prefix else str(name)
+        if isinstance(value, dict):
+            yield from _flatten(value, key)
+        else:
+            yield key, value
+
+
+def save_results(out_dir, output):
+    """
+    Write a nested dict of results as a directory of files plus a JSON manifest.
+    Arrays become .npy files, AverageTFR objects a .npy of their data plus
+    times/freqs/info, and Epochs a -epo.fif file, each under its '/'-joined key.
+    The files go into a fresh data-* directory and the manifest pointing at it
+    is swapped in with os.replace, so out_dir always holds one complete result
+    set, the previous one until the new one is fully written.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    manifest_path = os.path.join(out_dir, MANIFEST)
+    previous = _read_entries(out_dir) if has_results(out_dir) else {}
+    data_dir = os.path.basename(tempfile.mkdtemp(prefix="data-", dir=out_dir))
+
+    entries = {}
+    for key, value in _flatten(output):
+        stem = key.replace("/", "_")
+        path = os.path.join(out_dir, data_dir, stem)
+        if isinstance(value, mne.BaseEpochs):
+            value.save(f"{path}-epo.fif", overwrite=True)
+            entries[key] = {'kind': 'epochs', 'file': f"{data_dir}/{stem}-epo.fif"}
+        elif isinstance(value, AverageTFR):
+            np.save(f"{path}.npy", value.data)
+            np.save(f"{path}_times.npy", value.times)
+            np.save(f"{path}_freqs.npy", value.freqs)
+            mne.io.write_info(f"{path}-info.fif", value.info, overwrite=True)
+            entries[key] = {'kind': 'tfr', 'file': f"{data_dir}/{stem}.npy",
+                            'stem': f"{data_dir}/{stem}",
+                            'nave': value.nave, 'method': value.method,
+                            'comment': value.comment, 'shape': list(value.data.shape)}
+        else:
+            array = np.asarray(value)
+            np.save(f"{path}.npy", array)
+            entries[key] = {'kind': 'array', 'file': f"{data_dir}/{stem}.npy",
+                            'shape': list(array.shape), 'dtype': str(array.dtype)}
+
+    with open(manifest_path + ".tmp", 'w') as f:
+        json.dump({'version': 1, 'entries': entries}, f, indent=1)
+    os.replace(manifest_path + ".tmp", manifest_path)
+    _remove_stale(out_dir, previous, data_dir)
+
+
+def _read_entries(out_dir):
+    with open(os.path.join(out_dir, MANIFEST)) as f:
+        return json.load(f)['entries']
+
+
+def _remove_stale(out_dir, previous, data_dir):
+    """Delete the files of the replaced result set and data-* dirs of failed saves"""
+    for entry in previous.values():
+        if os.path.dirname(entry['file']):
+            continue
+        stem = entry.get('stem', entry['file'])
+        for name in (entry['file'], f"{stem}_times.npy", f"{stem}_freqs.npy", f"{stem}-info.fif"):
+            if os.path.isfile(os.path.join(out_dir, name)):
+                os.remove(os.path.join(out_dir, name))
+    for name in os.listdir(out_dir):
+        path = os.path.join(out_dir, name)
+        if name.startswith("data-") and name != data_dir and os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def has_results(out_dir):
+    return os.path.isfile(os.path.join(out_dir, MANIFEST))
+
+
+class ResultStore:
+    """
+    Lazy reader for a directory written by save_results.
+    store['psd/normalized_power/trigger'] memory-maps one array and
+    store['tfr/alpha/power/stim/neutral'] only reads that band's TFR, so cohort
+    scripts never load more than they use.
+    """
+
+    def __init__(self, out_dir):
+        self.out_dir = out_dir
+        self.entries = _read_entries(out_dir)
+
+    def keys(self, prefix=""):
+        return [key for key in self.entries if key.startswith(prefix)]
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def __getitem__(self, key):
+        entry = self.entries[key]
+        path = os.path.join(self.out_dir, entry['file'])
+        if entry['kind'] == 'array':
+            return np.load(path, mmap_mode='r')
+        if entry['kind'] == 'epochs':
+            return mne.read_epochs(path, preload=False)
+        stem = os.path.join(self.out_dir, entry['stem'])
+        return AverageTFRArray(
+            info=mne.io.read_info(f"{stem}-info.fif"),
+            data=np.load(path, mmap_mode='r'),
+            times=np.load(f"{stem}_times.npy"),
+            freqs=np.load(f"{stem}_freqs.npy"),
+            nave=entry['nave'], comment=entry['comment'], method=entry['method'])
+
+    def load(self, prefix=""):
+        """Load every entry under prefix back into a nested dict"""
+        tree = {}
+        for key in self.keys(prefix):
+            node = tree
+            *parents, name = key.split("/")
+            for parent in parents:
+                node = node.setdefault(parent, {})
+            node[name] = self[key]
+        return tree
+
+
+COHORT = "cohort.json"
+
+
+def write_cohort(root, subjects):
+    """
+    Write the cohort manifest of root: subjects maps the name of each complete
+    subject directory under root to its group, index and source file. Replaced
+    atomically, so a reader never sees a half written manifest.
+    """
+    path = os.path.join(root, COHORT)
+    with open(path + ".tmp", 'w') as f:
+        json.dump({'version': 1, 'subjects': dict(sorted(subjects.items()))}, f, indent=1)
+    os.replace(path + ".tmp", path)
+
+
+def read_cohort(root):
+    path = os.path.join(root, COHORT)
+    if not os.path.isfile(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)['subjects']
+
+
+class CohortStore:
+    """
+    The combined results of a batch_analyze run: cohort['CTRL01'] is that
+    subject's ResultStore and cohort.stack('psd/normalized_power/trigger')
+    stacks one entry over all subjects (of a group), loading nothing else.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self.subjects = read_cohort(root)
+
+    def names(self, group=None):
+        return [name for name, subject in self.subjects.items()
+                if group is None or subject['group'] == group]
+
+    def __getitem__(self, name):
+        return ResultStore(os.path.join(self.root, name))
+
+    def stack(self, key, group=None):
+        return np.stack([self[name][key] for name in self.names(group)])
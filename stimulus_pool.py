@@ -0,0 +1,74 @@
+import math
+import numpy as np
+
+
+def hamming_ramp(buffer, sample_rate):
+    """
+    Fade the first and last 5 ms in and out with the halves of a Hamming window,
+    the same ramp length as PsychoPy's hamming=True, applied once per buffer.
+    """
+    size = int(min(sample_rate // 200, len(buffer) // 15))
+    if size == 0:
+        return buffer
+    window = np.hamming(2 * size + 1).astype(np.float32)[:, None]
+    buffer[:size] *= window[:size]
+    buffer[-size:] *= window[size + 1:]
+    return buffer
+
+
+def load_stimulus(path, sample_rate, channels=2, secs=-1, hamming=True):
+    """
+    Decode an audio file into a float32 (n_samples, channels) buffer at the
+    device sample rate, cut to secs and ramped like PsychoPy's setSound would.
+    """
+    import soundfile as sf
+    buffer, file_rate = sf.read(path, dtype='float32', always_2d=True)
+    if file_rate != sample_rate:
+        from scipy.signal import resample_poly
+        gcd = math.gcd(int(file_rate), int(sample_rate))
+        buffer = resample_poly(buffer, int(sample_rate) // gcd, int(file_rate) // gcd,
+                               axis=0).astype(np.float32)
+    if secs is not None and secs > 0:
+        buffer = buffer[:int(round(secs * sample_rate))]
+    if buffer.shape[1] == 1 and channels == 2:
+        buffer = np.repeat(buffer, 2, axis=1)
+    buffer = np.ascontiguousarray(buffer, dtype=np.float32)
+    if hamming:
+        buffer = hamming_ramp(buffer, sample_rate)
+    return buffer
+
+
+class StimulusPool:
+    """
+    Every stimulus decoded once at experiment start, so a routine only has to
+    hand a ready buffer to its Sound object instead of reading the file from disk:
+
+        pool.add(hlt_stims, hlt_sound.sampleRate, secs=hlt_stim_duration)
+        hlt_sound.setSound(pool[sound_path], hamming=False, log=False)
+    """
+
+    def __init__(self, channels=2):
+        self.channels = channels
+        self.buffers = {}
+        self.sample_rates = {}
+
+    def add(self, paths, sample_rate, secs=-1, hamming=True):
+        """Decode every path not in the pool yet, repeated paths are decoded once"""
+        for path in dict.fromkeys(paths):
+            if path in self.buffers:
+                continue
+            self.buffers[path] = load_stimulus(path, sample_rate, self.channels, secs, hamming)
+            self.sample_rates[path] = sample_rate
+        print(f"stimulus pool: {len(self.buffers)} stimuli, {self.nbytes() / 1024 ** 2:.1f} MB")
+
+    def __getitem__(self, path):
+        return self.buffers[path]
+
+    def __contains__(self, path):
+        return path in self.buffers
+
+    def duration(self, path):
+        return len(self.buffers[path]) / self.sample_rates[path]
+
+    def nbytes(self):
+        return sum(buffer.nbytes for buffer in self.buffers.values())
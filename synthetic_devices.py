@@ -0,0 +1,187 @@
+import argparse
+import threading
+import numpy as np
+
+EEG_CHANNELS = ['L1', 'L2', 'L4', 'L5', 'L7', 'L8', 'L9', 'L10',
+                'R1', 'R2', 'R4', 'R5', 'R7', 'R8', 'R9', 'R10']
+
+
+class SyntheticDevice:
+    """
+    A fake LSL device. Subclasses set the stream description and implement
+    generate(n), which returns the next n samples and keeps the signal continuous
+    across calls. run() paces the samples with absolute deadlines: on every tick
+    it pushes all samples due since the start, stamped start + index / srate,
+    so late wake-ups never make the stream drift below its nominal rate.
+    """
+    name = None
+    stream_type = None
+    channel_format = 'float32'
+    source_id = None
+    channel_labels = None
+
+    def __init__(self, srate, channel_count, chunk_duration=0.04, outlet=None, seed=None):
+        self.srate = srate
+        self.channel_count = channel_count
+        self.chunk_duration = chunk_duration
+        self.outlet = outlet
+        self.rng = np.random.default_rng(seed)
+        self.samples_sent = 0
+
+    def generate(self, n):
+        raise NotImplementedError
+
+    def create_outlet(self):
+        from pylsl import StreamInfo, StreamOutlet
+        info = StreamInfo(self.name, self.stream_type, self.channel_count, self.srate,
+                          self.channel_format, self.source_id)
+        if self.channel_labels:
+            channels = info.desc().append_child("channels")
+            for label in self.channel_labels:
+                channels.append_child("channel").append_child_value("label", label)
+        return StreamOutlet(info, chunk_size=max(1, int(self.chunk_duration * self.srate)))
+
+    def run(self, stop_event, duration=None):
+        """Push samples in real time until stop_event is set or duration seconds have passed"""
+        from pylsl import local_clock
+        if self.outlet is None:
+            self.outlet = self.create_outlet()
+        start = local_clock()
+        while not stop_event.is_set():
+            elapsed = local_clock() - start
+            finished = duration is not None and elapsed >= duration
+            # samples stamped up to now, or all samples before the end of the run
+            total = int(np.ceil(duration * self.srate)) if finished else int(elapsed * self.srate) + 1
+            due = total - self.samples_sent
+            if due > 0:
+                samples = self.generate(due)
+                stamps = start + (self.samples_sent + np.arange(due)) / self.srate
+                self.outlet.push_chunk(samples.tolist(), stamps.tolist())
+                self.samples_sent += due
+            if finished:
+                break
+            # sleep to the next deadline rather than for a fixed period
+            next_deadline = start + (self.samples_sent + self.chunk_duration * self.srate) / self.srate
+            stop_event.wait(max(0.0, next_deadline - local_clock()))
+
+    def start(self, stop_event, duration=None):
+        thread = threading.Thread(target=self.run, args=(stop_event, duration), daemon=True)
+        thread.start()
+        return thread
+
+
+class SyntheticPPG(SyntheticDevice):
+    """
+    Finger PPG in the board's raw units: one systolic wave and a smaller dicrotic
+    wave per beat, with heart rate variability, respiratory baseline wander and
+    sensor noise.
+    """
+    name = 'PPGStream'
+    stream_type = 'PPG'
+    source_id = 'ppguid34234'
+
+    def __init__(self, srate=50, heart_rate=70, **kwargs):
+        super().__init__(srate, 1, **kwargs)
+        self.heart_rate = heart_rate
+        self.t = 0.0
+        self.beat_phase = 0.0
+
+    def generate(self, n):
+        t = self.t + np.arange(n) / self.srate
+        # beat-to-beat rate wanders slowly around heart_rate
+        rate = self.heart_rate / 60 * (1 + 0.05 * np.sin(2 * np.pi * 0.1 * t)
+                                       + 0.01 * self.rng.standard_normal(n))
+        phase = self.beat_phase + np.cumsum(rate) / self.srate
+        within = phase % 1.0
+        pulse = (np.exp(-((within - 0.25) / 0.08) ** 2)
+                 + 0.35 * np.exp(-((within - 0.55) / 0.1) ** 2))
+        respiration = 0.15 * np.sin(2 * np.pi * 0.25 * t)
+        values = 330 + 60 * (pulse + respiration) + self.rng.normal(0, 1.5, n)
+        self.t = t[-1] + 1 / self.srate
+        self.beat_phase = phase[-1]
+        return values[:, None]
+
+
+class SyntheticEEG(SyntheticDevice):
+    """
+    16 channel cEEGrid-like EEG in microvolts, as the OpenBCI board streams it:
+    1/f background, a posterior-ish alpha rhythm that varies per channel and slow
+    drift, at 125 Hz under the obci_eeg1 name the analysis expects.
+    """
+    name = 'obci_eeg1'
+    stream_type = 'EEG'
+    source_id = 'openbcieeg'
+    channel_labels = EEG_CHANNELS
+
+    def __init__(self, srate=125, **kwargs):
+        super().__init__(srate, len(EEG_CHANNELS), **kwargs)
+        self.t = 0.0
+        self.alpha_amplitude = self.rng.uniform(3, 10, self.channel_count)
+        self.state = np.zeros(self.channel_count)
+
+    def generate(self, n):
+        t = self.t + np.arange(n) / self.srate
+        white = self.rng.normal(0, 4, (n, self.channel_count))
+        # AR(1) low-pass of white noise for a 1/f-like background, continuous across chunks
+        background = np.empty_like(white)
+        state = self.state
+        for i in range(n):
+            state = 0.95 * state + white[i]
+            background[i] = state
+        self.state = state
+        alpha = self.alpha_amplitude * np.sin(2 * np.pi * 10 * t)[:, None] \
+            * (1 + 0.5 * np.sin(2 * np.pi * 0.2 * t))[:, None]
+        drift = 20 * np.sin(2 * np.pi * 0.05 * t)[:, None]
+        self.t = t[-1] + 1 / self.srate
+        return background + alpha + drift
+
+
+class SyntheticVideo(SyntheticDevice):
+    """Frame counter stream of a camera, like VideoRecorder pushes"""
+    name = 'VideoStream'
+    stream_type = 'Video'
+    source_id = 'videouid34234'
+
+    def __init__(self, srate=30, **kwargs):
+        super().__init__(srate, 1, **kwargs)
+        self.frame_number = 0
+
+    def generate(self, n):
+        frames = np.arange(self.frame_number, self.frame_number + n, dtype=float)
+        self.frame_number += n
+        return frames[:, None]
+
+
+def setup_parser():
+    parser = argparse.ArgumentParser(
+                    prog='synthetic_devices',
+                    description='emulate the EEG, PPG and video LSL streams of a session without hardware',
+                    epilog='if no device is selected all three are started. Combine with hearing.py and LabRecorder (or recording_service.py) to test the acquisition stack on any machine')
+    parser.add_argument('--eeg', action='store_true', help="16 channel 125 Hz obci_eeg1 EEG stream")
+    parser.add_argument('--ppg', action='store_true', help="50 Hz PPGStream")
+    parser.add_argument('--video', action='store_true', help="30 fps VideoStream frame counter")
+    parser.add_argument('-d', '--duration', type=float, help="seconds to run, until Ctrl+C if not given")
+    parser.add_argument('--seed', type=int, help="random seed of the synthetic signals")
+    return parser
+
+
+def main():
+    parser = setup_parser()
+    cmd_args = parser.parse_args()
+    selected = [cls for flag, cls in [(cmd_args.eeg, SyntheticEEG), (cmd_args.ppg, SyntheticPPG),
+                                      (cmd_args.video, SyntheticVideo)] if flag]
+    devices = [cls(seed=cmd_args.seed) for cls in selected or [SyntheticEEG, SyntheticPPG, SyntheticVideo]]
+    stop_event = threading.Event()
+    threads = [device.start(stop_event, cmd_args.duration) for device in devices]
+    print(f"streaming {', '.join(device.name for device in devices)}")
+    try:
+        for thread in threads:
+            while thread.is_alive():
+                thread.join(timeout=0.5)
+    except KeyboardInterrupt:
+        stop_event.set()
+    for device in devices:
+        print(f"{device.name}: {device.samples_sent} samples")
+
+if __name__ == "__main__":
+    main()
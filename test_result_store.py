@@ -0,0 +1,38 @@
+import os
+
+import mne
+import numpy as np
+import pytest
+from mne.time_frequency import AverageTFRArray
+
+from result_store import ResultStore, has_results, save_results
+
+
+def _output(scale):
+    info = mne.create_info(['Fpz', 'Cz'], 250., 'eeg')
+    tfr = AverageTFRArray(info=info, data=np.full((2, 3, 4), scale),
+                          times=np.arange(4) / 250., freqs=np.array([8., 10., 12.]), nave=5)
+    return {'psd': {'power': np.arange(6.) * scale}, 'tfr': {'alpha': tfr}}
+
+
+def test_save_twice(tmp_path):
+    out_dir = str(tmp_path / "CTRL01")
+    save_results(out_dir, _output(1.))
+    save_results(out_dir, _output(2.))
+    assert has_results(out_dir)
+    store = ResultStore(out_dir)
+    np.testing.assert_array_equal(store['psd/power'], np.arange(6.) * 2.)
+    np.testing.assert_array_equal(store['tfr/alpha'].data, np.full((2, 3, 4), 2.))
+    assert len([name for name in os.listdir(out_dir) if name.startswith("data-")]) == 1
+
+
+def test_failed_save_keeps_previous(tmp_path, monkeypatch):
+    out_dir = str(tmp_path / "CTRL01")
+    save_results(out_dir, _output(1.))
+
+    def write_info(*args, **kwargs):
+        raise OSError("disk full")
+    monkeypatch.setattr(mne.io, "write_info", write_info)
+    with pytest.raises(OSError):
+        save_results(out_dir, _output(2.))
+    np.testing.assert_array_equal(ResultStore(out_dir)['psd/power'], np.arange(6.))
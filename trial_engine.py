@@ -0,0 +1,375 @@
+import os
+import random
+import time
+from psychopy import data
+from psychopy.constants import FINISHED, PAUSED
+
+BLOCKS = ('pmt', 'hlt', 'let', 'ast')
+PHASES = ('prestim', 'stim', 'poststim')
+
+
+def get_audio_files(folder):
+    return [os.path.join(folder, file) for file in os.listdir(folder) if file.endswith('.wav') or file.endswith('.mp3')]
+
+
+def flip_onset_timestamp(win):
+    """LSL clock time of the next window flip, when a sound started with play(when=win) begins"""
+    from pylsl import local_clock
+    return local_clock() + win.getFutureFlipTime(clock='now')
+
+
+def compile_timeline(exp_config, stim_root, shuffle=('ast',)):
+    """
+    Turn one configuration of config.yaml into the trials of every block.
+    pmt runs pmt_trials trials without a stimulus; hlt, let and ast play every
+    file of stimuli/<block> <block>_trials times, in folder order or shuffled.
+    Returns: dict of block -> {'durations': {phase: seconds}, 'trials': [trial]}
+             where a trial is a dict with the 'stim' path and its 'name'
+    """
+    timeline = {}
+    for block in BLOCKS:
+        if block == 'pmt':
+            trials = [{} for _ in range(exp_config['pmt_trials'])]
+        else:
+            stims = get_audio_files(os.path.join(stim_root, block)) * exp_config[f"{block}_trials"]
+            if block in shuffle:
+                random.shuffle(stims)
+            trials = [{'stim': path, 'name': os.path.basename(path).split('.')[0]} for path in stims]
+        timeline[block] = {
+            'durations': {phase: exp_config[f"{block}_{phase}"] for phase in PHASES},
+            'trials': trials,
+        }
+    return timeline
+
+
+def routine_names(steps):
+    """Names of the routines in a table of Routines and Loops, in order of first appearance"""
+    names = []
+    for step in steps:
+        for routine in (step.routines if isinstance(step, Loop) else [step]):
+            if routine.name not in names:
+                names.append(routine.name)
+    return names
+
+
+class Routine:
+    """
+    One routine, described rather than generated. components are drawn from the
+    first flip until duration seconds have passed (seconds, a function of the
+    trial, or None to run until the response ends it). sound, if given, is
+    loaded with the trial's stimulus and played on the first flip. marker is
+    pushed when the routine begins and sound_marker stamped with the scheduled
+    sound onset, both formatted with the trial, e.g. "hlt_stim-{name}". data
+    columns are formatted the same way. response is a ClickResponse,
+    KeyResponse or SliderResponse that can end the routine and stores its data
+    at the end.
+    begin(trial) runs any other code before the routine starts.
+    A routine with a duration and no sound or response shows a static scene, so
+    it is drawn once and the engine sleeps until shortly before its end instead
+    of flipping every frame; idle=False keeps flipping, e.g. for components
+    that change while the routine runs.
+    """
+
+    def __init__(self, name, components=(), duration=None, sound=None, marker=None,
+                 sound_marker=None, data=None, response=None, begin=None, idle=None):
+        self.name = name
+        self.components = list(components)
+        self.duration = duration
+        self.sound = sound
+        self.marker = marker
+        self.sound_marker = sound_marker
+        self.data = data or {}
+        self.response = response
+        self.begin = begin
+        if idle is None:
+            idle = duration is not None and sound is None and response is None
+        self.idle = idle
+        self.tStartRefresh = None
+
+
+class Loop:
+    """Runs routines once per trial, under a TrialHandler2 named name so the data columns stay the same"""
+
+    def __init__(self, name, routines, trials):
+        self.name = name
+        self.routines = routines
+        self.trials = trials
+
+
+class ClickResponse:
+    """Ends a routine on a new mouse click and stores the clicks like a Builder mouse component"""
+
+    def __init__(self, mouse, name):
+        self.mouse = mouse
+        self.name = name
+
+    def reset(self):
+        mouse = self.mouse
+        mouse.x, mouse.y, mouse.time = [], [], []
+        mouse.leftButton, mouse.midButton, mouse.rightButton = [], [], []
+        mouse.mouseClock.reset()
+        # if a button is down already this isn't a new click
+        self.prev_buttons = mouse.getPressed()
+
+    def done(self):
+        buttons = self.mouse.getPressed()
+        if buttons == self.prev_buttons:
+            return False
+        self.prev_buttons = buttons
+        if sum(buttons) == 0:
+            return False
+        mouse = self.mouse
+        x, y = mouse.getPos()
+        mouse.x.append(x)
+        mouse.y.append(y)
+        mouse.leftButton.append(buttons[0])
+        mouse.midButton.append(buttons[1])
+        mouse.rightButton.append(buttons[2])
+        mouse.time.append(mouse.mouseClock.getTime())
+        return True
+
+    def save(self, exp, loop):
+        for field in ('x', 'y', 'leftButton', 'midButton', 'rightButton', 'time'):
+            exp.addData(f'{self.name}.{field}', getattr(self.mouse, field))
+
+
+class KeyResponse:
+    """Ends a routine on one of keys and stores the last key like a Builder keyboard component"""
+
+    def __init__(self, keyboard, name, keys=('space',)):
+        self.keyboard = keyboard
+        self.name = name
+        self.keys = list(keys)
+
+    def reset(self):
+        self.pressed = None
+        self.keyboard.clock.reset()
+        self.keyboard.clearEvents(eventType='keyboard')
+
+    def done(self):
+        keys = self.keyboard.getKeys(keyList=self.keys, ignoreKeys=["escape"], waitRelease=False)
+        if keys:
+            self.pressed = keys[-1]
+        return bool(keys)
+
+    def save(self, exp, loop):
+        exp.addData(f'{self.name}.keys', self.pressed.name if self.pressed else None)
+        if self.pressed:
+            exp.addData(f'{self.name}.rt', self.pressed.rt)
+            exp.addData(f'{self.name}.duration', self.pressed.duration)
+
+
+class SliderResponse:
+    """Ends a routine once any of the sliders is rated, storing every slider's rating and RT in the loop"""
+
+    def __init__(self, *sliders):
+        self.sliders = sliders
+
+    def reset(self):
+        for slider in self.sliders:
+            slider.reset()
+
+    def done(self):
+        return any(slider.getRating() is not None for slider in self.sliders)
+
+    def save(self, exp, loop):
+        target = loop if loop is not None else exp
+        for slider in self.sliders:
+            target.addData(f'{slider.name}.response', slider.getRating())
+            target.addData(f'{slider.name}.rt', slider.getRT())
+
+
+class TrialEngine:
+    """
+    Runs a table of Routines and Loops with one shared frame loop, replacing
+    the per-routine copies PsychoPy Builder generates. Everything a frame needs
+    is worked out when the routine starts, so a frame only compares the next
+    flip time with the routine's end, polls the response and the escape key,
+    and flips.
+
+        engine = TrialEngine(win, thisExp, expInfo, marker_outlet, defaultKeyboard,
+                             routineTimer, globalClock, endExperiment, pauseExperiment)
+        if not engine.run([welcome, Loop('trials_hlt', hlt_routines, trials), end]):
+            return  # escape was pressed
+    """
+
+    def __init__(self, win, exp, exp_info, marker_outlet, keyboard, routine_timer, global_clock,
+                 end_experiment, pause_experiment, stimulus_pool=None, session=None,
+                 frame_tolerance=0.001, frame_timer=None, idle_wake=0.05, idle_poll=0.02):
+        self.win = win
+        self.exp = exp
+        self.exp_info = exp_info
+        self.marker_outlet = marker_outlet
+        self.keyboard = keyboard
+        self.routine_timer = routine_timer
+        self.global_clock = global_clock
+        self.end_experiment = end_experiment
+        self.pause_experiment = pause_experiment
+        self.stimulus_pool = stimulus_pool
+        self.session = session
+        self.frame_tolerance = frame_tolerance
+        # frame_timing.FrameTimer, told which routine the flips belong to
+        self.frame_timer = frame_timer
+        # idle routines wake idle_wake seconds before their end to flip the remaining
+        # frames as usual, and check the keyboard every idle_poll seconds while asleep
+        self.idle_wake = idle_wake
+        self.idle_poll = idle_poll
+        # PsychoPy 2024 clocks take a timestamp format, the 2023 ones (passive.py) always give seconds
+        self.clock_format = {'format': global_clock.format} if hasattr(global_clock, 'format') else {}
+
+    def now(self):
+        return self.global_clock.getTime(format='float') if self.clock_format else self.global_clock.getTime()
+
+    def run(self, steps):
+        """Run Routines and Loops in order. Returns False if the experiment was ended early"""
+        for step in steps:
+            if isinstance(step, Loop):
+                if not self.run_loop(step):
+                    return False
+            else:
+                if not self.run_routine(step):
+                    return False
+                self.exp.nextEntry()
+        return True
+
+    def run_loop(self, loop):
+        handler = data.TrialHandler2(
+            name=loop.name, nReps=len(loop.trials), method='sequential',
+            extraInfo=self.exp_info, originPath=-1, trialList=[None], seed=None)
+        self.exp.addLoop(handler)
+        self.send_session_data()
+        for _ in handler:
+            trial = loop.trials[handler.thisN]
+            self.exp.timestampOnFlip(self.win, 'thisRow.t', **self.clock_format)
+            self.send_session_data()
+            for routine in loop.routines:
+                if not self.run_routine(routine, trial, handler):
+                    return False
+            self.exp.nextEntry()
+        self.send_session_data()
+        return True
+
+    def send_session_data(self):
+        if self.session is not None:
+            # if running in a Session with a Liaison client, send data up to now
+            self.session.sendExperimentData()
+
+    def load_sound(self, sound, trial):
+        """Load the trial's stimulus into sound, keeping its duration in trial['sound_duration'] for later routines"""
+        if self.stimulus_pool is not None:
+            sound.setSound(self.stimulus_pool[trial['stim']], hamming=False, log=False)
+            sound_duration = self.stimulus_pool.duration(trial['stim'])
+        else:
+            sound.setSound(trial['stim'], hamming=True, log=False)
+            sound_duration = sound.getDuration()
+        trial['sound_duration'] = sound_duration
+        print(f"{trial['name']}: {sound_duration}")
+        sound.setVolume(1.0, log=False)
+        sound.seek(0)
+
+    def sleep(self, until):
+        """
+        Wait until the routine timer reaches until without flipping, the scene
+        stays on screen. Stops early on escape or a pause request, which the
+        frame loop then handles.
+        """
+        if self.frame_timer is not None:
+            # the next flip interval is this wait, not a missed deadline
+            self.frame_timer.idle()
+        while True:
+            remaining = until - self.routine_timer.getTime()
+            if remaining <= 0:
+                return
+            time.sleep(min(remaining, self.idle_poll))
+            # keep the window responsive, flips would do this otherwise
+            self.win.dispatchAllWindowEvents()
+            if self.keyboard.getKeys(keyList=["escape"]):
+                self.exp.status = FINISHED
+            if self.exp.status in (FINISHED, PAUSED):
+                return
+
+    def run_routine(self, routine, trial=None, loop=None):
+        """Run one routine. Returns False if the experiment was ended during it"""
+        win, exp = self.win, self.exp
+        trial = trial or {}
+        if routine.begin is not None:
+            routine.begin(trial)
+        if routine.marker is not None:
+            self.marker_outlet.push_sample([routine.marker.format(**trial)])
+        for column, value in routine.data.items():
+            exp.addData(column, value.format(**trial))
+        sound, response = routine.sound, routine.response
+        if sound is not None:
+            self.load_sound(sound, trial)
+        if response is not None:
+            response.reset()
+        duration = routine.duration(trial) if callable(routine.duration) else routine.duration
+        # the routine ends on the first flip after this long since its first flip
+        end_after = None if duration is None else duration - self.frame_tolerance
+        routine.tStart = self.now()
+        exp.addData(f'{routine.name}.started', routine.tStart)
+        self.routine_timer.reset()
+        if self.frame_timer is not None:
+            self.frame_timer.begin_routine(routine.name)
+
+        sound_playing = False
+        first_frame = True
+        idle_pending = routine.idle
+        while True:
+            tThisFlipGlobal = win.getFutureFlipTime(clock=None)
+            if first_frame:
+                first_frame = False
+                routine.tStartRefresh = tThisFlipGlobal
+                win.timeOnFlip(routine, 'tStartRefresh')  # time at next scr refresh
+                for component in routine.components:
+                    component.setAutoDraw(True)
+                if sound is not None:
+                    exp.addData(f'{sound.name}.started', tThisFlipGlobal)
+                    stim_onset = flip_onset_timestamp(win)
+                    sound.play(when=win)  # sync with win flip
+                    sound_playing = True
+                    if routine.sound_marker is not None:
+                        # stamp the marker with the scheduled audio onset, not the time it is pushed
+                        self.marker_outlet.push_sample([routine.sound_marker.format(**trial)], stim_onset)
+            else:
+                finished = end_after is not None and tThisFlipGlobal > routine.tStartRefresh + end_after
+                if sound_playing and (finished or sound.isFinished):
+                    exp.timestampOnFlip(win, f'{sound.name}.stopped')
+                    sound.stop()
+                    sound_playing = False
+                if finished:
+                    break
+            if response is not None and response.done():
+                break
+
+            # check for quit (typically the Esc key)
+            if self.keyboard.getKeys(keyList=["escape"]):
+                exp.status = FINISHED
+            if exp.status == FINISHED:
+                self.end_experiment(exp, win=win)
+                return False
+            # pause experiment here if requested
+            if exp.status == PAUSED:
+                self.pause_experiment(thisExp=exp, win=win, timers=[self.routine_timer],
+                                      playbackComponents=[sound] if sound_playing else [])
+                # skip the frame we paused on, and sleep again once the scene is back
+                idle_pending = routine.idle
+                continue
+            win.flip()
+            if idle_pending:
+                idle_pending = False
+                # time left until the routine's last flip, counted from its first flip like
+                # the finish check above; the routine timer restarts after a pause
+                remaining = routine.tStartRefresh + end_after - win.getFutureFlipTime(clock=None)
+                if remaining > self.idle_wake:
+                    self.sleep(self.routine_timer.getTime() + remaining - self.idle_wake)
+
+        for component in routine.components:
+            component.setAutoDraw(False)
+        if sound is not None:
+            sound.pause()  # ensure sound has stopped at end of Routine
+        routine.tStop = self.now()
+        exp.addData(f'{routine.name}.stopped', routine.tStop)
+        if response is not None:
+            response.save(exp, loop)
+        return True
@@ -1,10 +1,20 @@
 import matplotlib.pyplot as plt
 from matplotlib.colors import TwoSlopeNorm
 import glob
+import hashlib
+import json
 import numpy as np
 import os
+import shutil
+import tempfile
 import mne
+from mne.time_frequency import AverageTFRArray
 import pyxdf
+from xdf_io import read_markers, stream_xdf
+
+# Decoded XDF recordings are cached here, keyed on the file and stream selection
+XDF_CACHE_DIR = os.environ.get(
+    'XDF_CACHE_DIR', os.path.join('exp_data', '.xdf_cache'))
 
 
 def closest_points_vector(eeg_timestamps, marker_timestamps):
@@ -123,7 +133,116 @@ def create_mne(eeg_stream, events, id_binding,
     return raw
 
 
-def parse_xdf(file_path, eeg_stream_name='obci_eeg1'):
+def _xdf_cache_key(file_path, eeg_stream_name, loader):
+    stat = os.stat(file_path)
+    key = "|".join([os.path.abspath(file_path), str(stat.st_size),
+                    str(stat.st_mtime_ns), eeg_stream_name, loader])
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+
+def _save_xdf_cache(cache_path, marker_data, marker_timestamps, eeg_stream):
+    # Write into a scratch directory first so a crash never leaves a half-written entry
+    tmp_path = f"{cache_path}.tmp{os.getpid()}"
+    os.makedirs(tmp_path, exist_ok=True)
+    np.save(os.path.join(tmp_path, 'marker_data.npy'), marker_data)
+    np.save(os.path.join(tmp_path, 'marker_timestamps.npy'), marker_timestamps)
+    np.save(os.path.join(tmp_path, 'eeg_time_series.npy'),
+            np.asarray(eeg_stream['time_series']))
+    np.save(os.path.join(tmp_path, 'eeg_timestamps.npy'),
+            np.asarray(eeg_stream['time_stamps']))
+    with open(os.path.join(tmp_path, 'eeg_info.json'), 'w') as f:
+        json.dump(eeg_stream['info'], f,
+                  default=lambda o: o.tolist() if hasattr(o, 'tolist') else str(o))
+    try:
+        os.rename(tmp_path, cache_path)
+    except OSError:
+        # another process filled the same entry in the meantime
+        shutil.rmtree(tmp_path, ignore_errors=True)
+
+
+def _stream_xdf_cache(file_path, eeg_stream_name, cache_path, block_size):
+    # stream_xdf writes the EEG arrays straight into the scratch directory, they
+    # only need renaming to the cache layout, so the recording never sits in memory
+    tmp_path = f"{cache_path}.tmp{os.getpid()}"
+    streams = stream_xdf(file_path, tmp_path, block_size=block_size,
+                         stream_types=('Markers', 'EEG'))
+    marker_stream = next(
+        stream for stream in streams if stream['info']['type'][0] == 'Markers')
+    eeg_stream = next(
+        stream for stream in streams
+        if stream['info']['type'][0] == 'EEG' and stream['info']['name'][0] == eeg_stream_name)
+    eeg_id = eeg_stream['info']['stream_id']
+    for stream in streams:
+        for field, name in [('time_series', 'eeg_time_series.npy'), ('time_stamps', 'eeg_timestamps.npy')]:
+            src = os.path.join(tmp_path, f"stream{stream['info']['stream_id']}_{field}.npy")
+            if not os.path.exists(src):
+                continue
+            if stream['info']['stream_id'] == eeg_id:
+                os.replace(src, os.path.join(tmp_path, name))
+            else:
+                os.remove(src)  # other EEG streams
+    np.save(os.path.join(tmp_path, 'marker_data.npy'),
+            np.array(marker_stream['time_series']).squeeze())
+    np.save(os.path.join(tmp_path, 'marker_timestamps.npy'),
+            np.asarray(marker_stream['time_stamps']))
+    with open(os.path.join(tmp_path, 'eeg_info.json'), 'w') as f:
+        json.dump(eeg_stream['info'], f)
+    try:
+        os.rename(tmp_path, cache_path)
+    except OSError:
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        if not os.path.isdir(cache_path):
+            raise
+
+
+def _load_xdf_cache(cache_path):
+    marker_data = np.load(os.path.join(
+        cache_path, 'marker_data.npy'), mmap_mode='r')
+    marker_timestamps = np.load(os.path.join(
+        cache_path, 'marker_timestamps.npy'), mmap_mode='r')
+    with open(os.path.join(cache_path, 'eeg_info.json')) as f:
+        eeg_info = json.load(f)
+    eeg_stream = {
+        'info': eeg_info,
+        'time_series': np.load(os.path.join(cache_path, 'eeg_time_series.npy'), mmap_mode='r'),
+        'time_stamps': np.load(os.path.join(cache_path, 'eeg_timestamps.npy'), mmap_mode='r'),
+    }
+    return marker_data, marker_timestamps, eeg_stream
+
+
+def load_xdf_streams(file_path, eeg_stream_name='obci_eeg1', cache_dir=XDF_CACHE_DIR,
+                     block_size=None):
+    """
+    Load the marker and EEG streams of an XDF recording.
+    Decoded streams are stored as .npy files under cache_dir and memory-mapped
+    on later calls, so a recording is only parsed once. Pass cache_dir=None
+    to always parse the file.
+    block_size: if set, decode the file incrementally with xdf_io.stream_xdf,
+    holding at most this many samples per stream in memory, for recordings
+    larger than RAM. The arrays are written to cache_dir, which is then
+    required; it can be a temporary directory the caller removes once the
+    arrays are released.
+    Returns:
+        marker_data: array of marker strings
+        marker_timestamps: array of marker timestamps
+        eeg_stream: dict with 'info', 'time_series' and 'time_stamps'
+    """
+    if block_size is not None and cache_dir is None:
+        raise ValueError("block_size needs a cache_dir to write the decoded streams to")
+    cache_path = None
+    if cache_dir is not None:
+        # the two loaders dejitter and clock-correct separately, keep their results apart
+        loader = 'stream_xdf' if block_size is not None else 'pyxdf'
+        cache_path = os.path.join(
+            cache_dir, _xdf_cache_key(file_path, eeg_stream_name, loader))
+        if os.path.isdir(cache_path):
+            return _load_xdf_cache(cache_path)
+
+    if block_size is not None:
+        os.makedirs(cache_dir, exist_ok=True)
+        _stream_xdf_cache(file_path, eeg_stream_name, cache_path, block_size)
+        return _load_xdf_cache(cache_path)
+
     data, header = pyxdf.load_xdf(file_path)
     # print([stream['info']['type'][0] for stream in data])
     # Extract the EEG and marker streams
@@ -132,8 +251,117 @@ def parse_xdf(file_path, eeg_stream_name='obci_eeg1'):
     eeg_stream = next(
         stream for stream in data
         if stream['info']['type'][0] == 'EEG' and stream['info']['name'][0] == eeg_stream_name)
-    marker_timestamps = marker_stream['time_stamps']
+    marker_timestamps = np.asarray(marker_stream['time_stamps'])
     marker_data = np.array(marker_stream['time_series']).squeeze()
+
+    if cache_path is not None:
+        os.makedirs(cache_dir, exist_ok=True)
+        _save_xdf_cache(cache_path, marker_data, marker_timestamps, eeg_stream)
+    return marker_data, marker_timestamps, eeg_stream
+
+
+def audio_envelope(audio, srate, smooth=0.002):
+    """Moving average of the rectified signal over smooth seconds"""
+    width = max(1, int(round(smooth * srate)))
+    rectified = np.abs(np.asarray(audio, dtype=float))
+    cumsum = np.concatenate([[0.0], np.cumsum(rectified)])
+    envelope = (cumsum[width:] - cumsum[:-width]) / width
+    # pad to the input length, aligned so a rising edge is not shifted early
+    return np.concatenate([np.full(width - 1, envelope[0]), envelope])
+
+
+def detect_audio_onsets(audio, audio_timestamps, marker_timestamps, srate,
+                        window=(-0.05, 0.5), threshold=0.2, smooth=0.002):
+    """
+    Find the acoustic onset following each marker in a loopback recording.
+    The envelope of every marker's window is cut out in one fancy-indexing step.
+    The onset is the first sample whose envelope rises threshold of the way from
+    the pre-marker noise floor to the window's peak.
+    Returns: onset times on the audio clock, NaN where the window is out of range
+             or holds no sound
+    """
+    envelope = audio_envelope(audio, srate, smooth)
+    audio_timestamps = np.asarray(audio_timestamps)
+    marker_timestamps = np.asarray(marker_timestamps)
+    n_window = int(round((window[1] - window[0]) * srate))
+    n_pre = int(round(-window[0] * srate))
+    starts = np.searchsorted(audio_timestamps, marker_timestamps + window[0])
+    valid = starts + n_window <= len(envelope)
+    index = np.minimum(starts[:, None] + np.arange(n_window), len(envelope) - 1)
+    segments = envelope[index]
+
+    floor = np.median(segments[:, :max(n_pre, 1)], axis=1)
+    peak = segments.max(axis=1)
+    level = floor + threshold * (peak - floor)
+    above = segments > level[:, None]
+    first = above.argmax(axis=1)
+    # a window without sound has a peak indistinguishable from its floor
+    valid &= above.any(axis=1) & (peak > 4 * floor)
+
+    onsets = np.full(len(marker_timestamps), np.nan)
+    onsets[valid] = audio_timestamps[index[valid, first[valid]]]
+    return onsets
+
+
+def latency_stats(latencies):
+    """Summary of a latency distribution in seconds, ignoring missed onsets"""
+    latencies = np.asarray(latencies, dtype=float)
+    latencies = latencies[~np.isnan(latencies)]
+    if len(latencies) == 0:
+        return {'n': 0}
+    return {
+        'n': int(len(latencies)),
+        'mean': float(latencies.mean()),
+        'jitter': float(latencies.std()),
+        'p99': float(np.percentile(latencies, 99)),
+        'min': float(latencies.min()),
+        'max': float(latencies.max()),
+    }
+
+
+def measure_audio_latencies(marker_data, marker_timestamps, audio, audio_timestamps, srate,
+                            prefix=('hlt_stim', 'let_stim', 'ast_stim', 'stim')):
+    """
+    Latency from each stimulus marker to its acoustic onset, grouped per marker label.
+    Returns: dict of marker label -> latency_stats
+    """
+    marker_data = np.asarray(marker_data)
+    marker_timestamps = np.asarray(marker_timestamps)
+    is_stim = np.char.startswith(marker_data.astype(str), prefix[0])
+    for p in prefix[1:]:
+        is_stim |= np.char.startswith(marker_data.astype(str), p)
+    onsets = detect_audio_onsets(audio, audio_timestamps, marker_timestamps[is_stim], srate)
+    latencies = onsets - marker_timestamps[is_stim]
+    labels = marker_data[is_stim]
+    return {str(label): latency_stats(latencies[labels == label]) for label in np.unique(labels)}
+
+
+def load_latency_offsets(path):
+    """Mean latency per marker label from a file written by calibrate_latency.py"""
+    with open(path) as f:
+        stimuli = json.load(f)['stimuli']
+    return {label: stats['mean'] for label, stats in stimuli.items() if stats.get('n', 0) > 0}
+
+
+def apply_latency_offsets(marker_data, marker_timestamps, latency_offsets):
+    """
+    Shift each marker by the measured latency of its label, so events land on the
+    acoustic onset. latency_offsets is a dict of label -> seconds or the path of
+    a latency_offsets.json. Markers without a measured latency are left as they are.
+    """
+    if isinstance(latency_offsets, str):
+        latency_offsets = load_latency_offsets(latency_offsets)
+    shifts = np.array([latency_offsets.get(label, 0.0) for label in np.atleast_1d(marker_data)])
+    return np.asarray(marker_timestamps) + shifts
+
+
+def parse_xdf(file_path, eeg_stream_name='obci_eeg1', cache_dir=XDF_CACHE_DIR,
+              block_size=None, latency_offsets=None):
+    marker_data, marker_timestamps, eeg_stream = load_xdf_streams(
+        file_path, eeg_stream_name, cache_dir=cache_dir, block_size=block_size)
+    if latency_offsets is not None:
+        marker_timestamps = apply_latency_offsets(
+            marker_data, marker_timestamps, latency_offsets)
     eeg_timestamps = eeg_stream['time_stamps']
     eeg_insert_points = closest_points_vector(
         eeg_timestamps, marker_timestamps)
@@ -143,6 +371,7 @@ def parse_xdf(file_path, eeg_stream_name='obci_eeg1'):
 def get_event_names(files, prefix='ast_stim', exclude_participants=[]):
     """
     Extracts event names from marker data that start with a given prefix.
+    Only the marker stream is decoded, the EEG/Video/PPG chunks are skipped.
     Returns:
         name_mapping: dict mapping participant to their event names
         common_names: set of event names present for every participant
@@ -154,7 +383,7 @@ def get_event_names(files, prefix='ast_stim', exclude_participants=[]):
         if participant_number in exclude_participants:
             continue
         participant_id = file.split(os.sep)[-1].split('_')[0]
-        marker_data, _, _ = parse_xdf(file)
+        marker_data, _ = read_markers(file)
         names = {str(f) for f in np.unique(marker_data)
                  if str(f).startswith(prefix)}
         name_mapping[f"{participant_number}_{participant_id}"] = names
@@ -168,17 +397,29 @@ def get_event_names(files, prefix='ast_stim', exclude_participants=[]):
 
 
 def read_data(file_path, eeg_stream_name='obci_eeg1', bindings=None,
-              bandpass={'low': 1, 'high': 50}, flat_voltage=0.1):
-    marker_data, eeg_stream, eeg_insert_points = parse_xdf(
-        file_path, eeg_stream_name)
-    # Create MNE events from the marker data
-    if bindings is None:
-        bindings = ['pmt', 'hlt', 'let', 'ast']
-    marker_dict, id_binding, category_mapping = create_mappings(
-        marker_data, bindings)
-    events = create_events(eeg_insert_points, marker_dict, marker_data)
-    raw = create_mne(eeg_stream, events, id_binding,
-                     bandpass=bandpass, flat_voltage=flat_voltage)
+              bandpass={'low': 1, 'high': 50}, flat_voltage=0.1, cache_dir=XDF_CACHE_DIR,
+              block_size=None, latency_offsets=None):
+    work_dir = None
+    if block_size is not None and cache_dir is None:
+        # the decoded arrays are only needed until create_mne has copied them
+        work_dir = cache_dir = tempfile.mkdtemp(prefix='xdf_')
+    try:
+        marker_data, eeg_stream, eeg_insert_points = parse_xdf(
+            file_path, eeg_stream_name, cache_dir=cache_dir, block_size=block_size,
+            latency_offsets=latency_offsets)
+        marker_data = np.array(marker_data)
+        # Create MNE events from the marker data
+        if bindings is None:
+            bindings = ['pmt', 'hlt', 'let', 'ast']
+        marker_dict, id_binding, category_mapping = create_mappings(
+            marker_data, bindings)
+        events = create_events(eeg_insert_points, marker_dict, marker_data)
+        raw = create_mne(eeg_stream, events, id_binding,
+                         bandpass=bandpass, flat_voltage=flat_voltage)
+        del eeg_stream  # unmap the files before they are removed
+    finally:
+        if work_dir is not None:
+            shutil.rmtree(work_dir, ignore_errors=True)
     return raw, events, category_mapping
     # return eeg_stream, events, id_binding, category_mapping
 
@@ -246,6 +487,43 @@ def compute_tf_analysis(epochs, freqs, n_cycles):
         decim=3,
     )
 
+def compute_tf_bands(epochs, bands, n_cycles_ratio=2.0, decim=3, n_jobs=None):
+    """
+    Morlet TFR of several frequency bands in a single pass.
+    All band frequencies are convolved in one compute_tfr call, which shares the
+    FFT of the epochs between wavelets, and the result is sliced into one
+    AverageTFR per band. Same output as calling compute_tf_analysis per band.
+    With average=True mne convolves and accumulates one epoch at a time, so the
+    complex TFR of all epochs is never held; peak memory is the averaged output
+    of all bands plus one epoch's complex TFR at every frequency, about the same
+    as the per-band calls, not lower.
+    bands: dict of band -> array of frequencies
+    Returns: (power, itc) dicts of band -> AverageTFR
+    """
+    freqs = np.concatenate([np.asarray(f) for f in bands.values()])
+    power, itc = epochs.compute_tfr(
+        method="morlet",
+        freqs=freqs,
+        n_cycles=freqs / n_cycles_ratio,
+        average=True,
+        return_itc=True,
+        decim=decim,
+        use_fft=True,
+        n_jobs=n_jobs,
+    )
+    band_power = {}
+    band_itc = {}
+    start = 0
+    for band, band_freqs in bands.items():
+        idx = slice(start, start + len(band_freqs))
+        start += len(band_freqs)
+        for tfr, out in ((power, band_power), (itc, band_itc)):
+            out[band] = AverageTFRArray(
+                info=tfr.info, data=tfr.data[:, idx], times=tfr.times,
+                freqs=tfr.freqs[idx], nave=tfr.nave, comment=tfr.comment,
+                method=tfr.method)
+    return band_power, band_itc
+
 def plot_tf_analysis(power):
     channels = power.ch_names
     n_channels = len(channels)
@@ -327,37 +605,35 @@ def compute_band_ratios(power, freqs, bands={
     'alpha': (8, 13),
     'beta': (13, 30),
     'gamma': (30, 50)
-}):
+}, per_epoch=False):
     """
     Compute normalized average power per band per channel for PSD data.
-    power: shape (n_epochs, n_channels, n_freqs)
+    power: shape (..., n_epochs, n_channels, n_freqs), e.g. (n_epochs, n_channels, n_freqs)
+           for one subject or (n_subjects, n_epochs, n_channels, n_freqs) for a cohort
     freqs: shape (n_freqs,)
-    Returns: dict of band -> array of shape (n_channels,)
+    per_epoch: keep the epoch axis instead of averaging the PSD over epochs first
+    Returns: dict of band -> array of shape (..., n_channels), or (..., n_epochs, n_channels)
+             with per_epoch=True
     """
+    power = np.asarray(power)
+    freqs = np.asarray(freqs)
 
-    # Get frequency indices for each band
-    band_indices = {
-        band: np.where((freqs >= low) & (freqs < high))[0]
-        for band, (low, high) in bands.items()
-    }
+    # Average power over epochs: shape (..., n_channels, n_freqs)
+    if not per_epoch:
+        power = power.mean(axis=-3)
+
+    # Normalize every spectrum once, it is shared by all bands
+    p_min = power.min(axis=-1, keepdims=True)
+    p_max = power.max(axis=-1, keepdims=True)
+    power_norm = (power - p_min) / (p_max - p_min + 1e-12)
+
+    # (n_freqs, n_bands) averaging matrix, so all band means are one matmul
+    band_masks = np.stack([(freqs >= low) & (freqs < high)
+                           for low, high in bands.values()], axis=-1).astype(power_norm.dtype)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        band_avg = (power_norm @ band_masks) / band_masks.sum(axis=0)
 
-    # Average power over epochs: shape (n_channels, n_freqs)
-    mean_power = power.mean(axis=0)
-
-    # Calculate normalized average power per band per channel
-    band_power_norm = {}
-    for band, idxs in band_indices.items():
-        band_power_norm[band] = []
-        for ch in range(mean_power.shape[0]):
-            data = mean_power[ch]
-            # Normalize the PSD for this channel
-            data_norm = (data - data.min()) / (data.max() - data.min() + 1e-12)
-            # Average over band freqs
-            band_avg = data_norm[idxs].mean()
-            band_power_norm[band].append(band_avg)
-        band_power_norm[band] = np.array(band_power_norm[band])
-
-    return band_power_norm
+    return {band: band_avg[..., i] for i, band in enumerate(bands)}
 
 
 if __name__ == "__main__":
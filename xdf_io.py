@@ -0,0 +1,495 @@
+import gzip
+import os
+import struct
+import xml.etree.ElementTree as ET
+import numpy as np
+
+# XDF chunk tags, see https://github.com/sccn/xdf/wiki/Specifications
+FILE_HEADER = 1
+STREAM_HEADER = 2
+SAMPLES = 3
+CLOCK_OFFSET = 4
+BOUNDARY = 5
+STREAM_FOOTER = 6
+
+
+def open_xdf(file_path):
+    f = gzip.open(file_path, 'rb') if file_path.endswith('.xdfz') else open(file_path, 'rb')
+    if f.read(4) != b'XDF:':
+        f.close()
+        raise ValueError(f"{file_path} is not an XDF file")
+    return f
+
+
+def _read_varlen_int(f):
+    nbytes = f.read(1)[0]
+    return int.from_bytes(f.read(nbytes), 'little')
+
+
+def _unpack_varlen_int(buf, pos):
+    nbytes = buf[pos]
+    return int.from_bytes(buf[pos + 1:pos + 1 + nbytes], 'little'), pos + 1 + nbytes
+
+
+def iter_chunks(f):
+    """
+    Walk the chunks of an open XDF file.
+    Yields (tag, stream_id, content_length) with the file positioned at the start
+    of the chunk content (after the stream id). Whatever the caller does not read
+    is skipped with a seek, so sample data of unwanted streams is never decoded.
+    """
+    while True:
+        nbytes = f.read(1)
+        if not nbytes:
+            return
+        try:
+            length = int.from_bytes(f.read(nbytes[0]), 'little')
+            tag = struct.unpack('<H', f.read(2))[0]
+        except struct.error:
+            return  # truncated file, e.g. the recorder was killed
+        content_length = length - 2
+        stream_id = None
+        if STREAM_HEADER <= tag <= STREAM_FOOTER:
+            stream_id = struct.unpack('<I', f.read(4))[0]
+            content_length -= 4
+        end = f.tell() + content_length
+        yield tag, stream_id, content_length
+        f.seek(end)
+
+
+def parse_stream_header(xml_bytes):
+    """Return the commonly used <info> fields of a stream header as plain values."""
+    root = ET.fromstring(xml_bytes.decode('utf-8', errors='replace'))
+    return {
+        'name': root.findtext('name'),
+        'type': root.findtext('type'),
+        'channel_count': int(root.findtext('channel_count')),
+        'channel_format': root.findtext('channel_format'),
+        'nominal_srate': float(root.findtext('nominal_srate')),
+        'source_id': root.findtext('source_id') or '',
+        'xml': xml_bytes,
+    }
+
+
+def _decode_string_samples(buf, channel_count, srate, last_ts):
+    n_samples, pos = _unpack_varlen_int(buf, 0)
+    values = []
+    stamps = np.empty(n_samples)
+    for i in range(n_samples):
+        if buf[pos] == 8:
+            last_ts = struct.unpack_from('<d', buf, pos + 1)[0]
+            pos += 9
+        else:
+            # timestamp omitted: deduce it from the previous one
+            pos += 1
+            last_ts = last_ts + (1.0 / srate if srate > 0 else 0.0)
+        stamps[i] = last_ts
+        sample = []
+        for _ in range(channel_count):
+            length, pos = _unpack_varlen_int(buf, pos)
+            sample.append(buf[pos:pos + length].decode('utf-8', errors='replace'))
+            pos += length
+        values.append(sample)
+    return values, stamps, last_ts
+
+
+def clock_correction(timestamps, clock_times, clock_values):
+    """
+    Map timestamps onto the recording computer's clock with a linear fit of the
+    recorded clock offsets. This matches pyxdf's synchronisation as long as the
+    stream had no clock resets.
+    """
+    if len(clock_times) == 0:
+        return timestamps
+    if len(clock_times) == 1:
+        return timestamps + clock_values[0]
+    slope, intercept = np.polyfit(clock_times, clock_values, 1)
+    return timestamps + intercept + slope * timestamps
+
+
+def read_markers(file_path, stream_type='Markers', synchronize_clocks=True):
+    """
+    Read the first stream of the given type without decoding any other stream.
+    Sample chunks of EEG, Video, PPG, etc. are skipped by seeking past them.
+    Returns:
+        marker_data: array of marker strings
+        marker_timestamps: array of marker timestamps
+    """
+    marker_id = None
+    srate = 0.0
+    channel_count = 1
+    values, stamps = [], []
+    clock_times, clock_values = [], []
+    last_ts = 0.0
+    with open_xdf(file_path) as f:
+        for tag, stream_id, length in iter_chunks(f):
+            if tag == STREAM_HEADER and marker_id is None:
+                header = parse_stream_header(f.read(length))
+                if header['type'] == stream_type:
+                    marker_id = stream_id
+                    srate = header['nominal_srate']
+                    channel_count = header['channel_count']
+            elif stream_id is None or stream_id != marker_id:
+                continue
+            elif tag == SAMPLES:
+                chunk_values, chunk_stamps, last_ts = _decode_string_samples(
+                    f.read(length), channel_count, srate, last_ts)
+                values.extend(chunk_values)
+                stamps.append(chunk_stamps)
+            elif tag == CLOCK_OFFSET and synchronize_clocks:
+                collection_time, offset = struct.unpack('<dd', f.read(16))
+                clock_times.append(collection_time)
+                clock_values.append(offset)
+
+    if marker_id is None:
+        raise ValueError(f"No stream of type '{stream_type}' in {file_path}")
+    marker_timestamps = np.concatenate(stamps) if stamps else np.empty(0)
+    if synchronize_clocks:
+        marker_timestamps = clock_correction(
+            marker_timestamps, np.array(clock_times), np.array(clock_values))
+    marker_data = np.array(values, dtype=str).reshape(len(values), channel_count).squeeze()
+    return marker_data, marker_timestamps
+
+
+NUMERIC_FORMATS = {
+    'float32': '<f4',
+    'double64': '<f8',
+    'int8': 'i1',
+    'int16': '<i2',
+    'int32': '<i4',
+    'int64': '<i8',
+}
+
+
+def _decode_numeric_samples(buf, channel_count, dtype, srate, last_ts):
+    n_samples, pos = _unpack_varlen_int(buf, 0)
+    if n_samples == 0:
+        return np.empty((0, channel_count), dtype), np.empty(0), last_ts
+    value_size = channel_count * dtype.itemsize
+    # Fast path: every sample of the chunk carries a timestamp (the usual case for
+    # LabRecorder files) or none does, so the chunk is one fixed-size record array
+    has_stamps = buf[pos] == 8
+    record = np.dtype([('flag', 'u1')] + ([('ts', '<f8')] if has_stamps else [])
+                      + [('values', dtype, (channel_count,))])
+    if len(buf) - pos == n_samples * record.itemsize:
+        records = np.frombuffer(buf, record, count=n_samples, offset=pos)
+        if (records['flag'] == buf[pos]).all():
+            if has_stamps:
+                stamps = records['ts'].copy()
+            else:
+                stamps = last_ts + np.arange(1, n_samples + 1) / srate
+            return records['values'].copy(), stamps, stamps[-1]
+
+    values = np.empty((n_samples, channel_count), dtype)
+    stamps = np.empty(n_samples)
+    for i in range(n_samples):
+        if buf[pos] == 8:
+            last_ts = struct.unpack_from('<d', buf, pos + 1)[0]
+            pos += 9
+        else:
+            pos += 1
+            last_ts = last_ts + (1.0 / srate if srate > 0 else 0.0)
+        stamps[i] = last_ts
+        values[i] = np.frombuffer(buf, dtype, count=channel_count, offset=pos)
+        pos += value_size
+    return values, stamps, last_ts
+
+
+def scan_xdf(file_path):
+    """
+    Read the stream headers and count the samples of every stream, without
+    decoding any sample data.
+    Returns: dict of stream_id -> header fields (see parse_stream_header) plus 'n_samples'
+    """
+    streams = {}
+    with open_xdf(file_path) as f:
+        for tag, stream_id, length in iter_chunks(f):
+            if tag == STREAM_HEADER:
+                streams[stream_id] = parse_stream_header(f.read(length))
+                streams[stream_id]['n_samples'] = 0
+            elif tag == SAMPLES and stream_id in streams:
+                streams[stream_id]['n_samples'] += _read_varlen_int(f)
+    return streams
+
+
+def iter_sample_chunks(file_path, streams):
+    """
+    Decode the sample chunks of the given streams one at a time.
+    streams: dict of stream_id -> header as returned by scan_xdf, other streams are skipped
+    Yields (stream_id, values, timestamps) and (stream_id, collection_time, offset)
+    tuples for clock offsets, distinguished by tag as the first element.
+    """
+    last_ts = {stream_id: 0.0 for stream_id in streams}
+    with open_xdf(file_path) as f:
+        for tag, stream_id, length in iter_chunks(f):
+            if stream_id not in streams:
+                continue
+            header = streams[stream_id]
+            if tag == SAMPLES:
+                buf = f.read(length)
+                if header['channel_format'] == 'string':
+                    values, stamps, last_ts[stream_id] = _decode_string_samples(
+                        buf, header['channel_count'], header['nominal_srate'], last_ts[stream_id])
+                else:
+                    values, stamps, last_ts[stream_id] = _decode_numeric_samples(
+                        buf, header['channel_count'], np.dtype(NUMERIC_FORMATS[header['channel_format']]),
+                        header['nominal_srate'], last_ts[stream_id])
+                yield SAMPLES, stream_id, values, stamps
+            elif tag == CLOCK_OFFSET:
+                collection_time, offset = struct.unpack('<dd', f.read(16))
+                yield CLOCK_OFFSET, stream_id, collection_time, offset
+
+
+class _BlockWriter:
+    """Appends rows to a preallocated .npy file, holding at most block_size rows in memory"""
+
+    def __init__(self, path, dtype, shape, block_size):
+        np.lib.format.open_memmap(path, mode='w+', dtype=dtype, shape=shape).flush()
+        self.file = open(path, 'r+b')
+        self.file.seek(np.load(path, mmap_mode='r').offset)
+        self.block_size = block_size
+        self.pending = []
+        self.n_pending = 0
+
+    def append(self, rows):
+        self.pending.append(np.ascontiguousarray(rows))
+        self.n_pending += len(rows)
+        if self.n_pending >= self.block_size:
+            self.flush()
+
+    def flush(self):
+        for rows in self.pending:
+            self.file.write(rows.tobytes())
+        self.pending = []
+        self.n_pending = 0
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+
+def _fix_timestamps(path, clock_times, clock_values, srate, block_size,
+                    jitter_break_threshold_seconds=1, jitter_break_threshold_samples=500):
+    """
+    Clock-correct and, for regularly sampled streams, dejitter the timestamps in
+    the .npy file at path, block by block. Dejittering fits a line to each segment
+    between gaps, with the same gap thresholds as pyxdf.
+    """
+    stamps = np.load(path, mmap_mode='r+')
+    n = len(stamps)
+    if len(clock_times) > 0:
+        if len(clock_times) == 1:
+            intercept, slope = clock_values[0], 0.0
+        else:
+            slope, intercept = np.polyfit(clock_times, clock_values, 1)
+        for start in range(0, n, block_size):
+            block = stamps[start:start + block_size]
+            block += intercept + slope * block
+    if srate <= 0 or n < 2:
+        stamps.flush()
+        return
+
+    threshold = max(jitter_break_threshold_seconds, jitter_break_threshold_samples / srate)
+    breaks = []
+    for start in range(0, n - 1, block_size):
+        diffs = np.diff(stamps[start:start + block_size + 1])
+        breaks.extend(start + np.flatnonzero(np.abs(diffs) > threshold) + 1)
+    bounds = [0] + breaks + [n]
+    for seg_start, seg_stop in zip(bounds[:-1], bounds[1:]):
+        # least squares fit of timestamp against sample index, from running sums
+        sums = np.zeros(5)
+        for start in range(seg_start, seg_stop, block_size):
+            y = np.asarray(stamps[start:min(start + block_size, seg_stop)]) - stamps[seg_start]
+            x = np.arange(start - seg_start, start - seg_start + len(y), dtype=float)
+            sums += [len(y), x.sum(), y.sum(), (x * x).sum(), (x * y).sum()]
+        count, sx, sy, sxx, sxy = sums
+        denom = count * sxx - sx * sx
+        if denom == 0:
+            continue
+        slope = (count * sxy - sx * sy) / denom
+        intercept = (sy - slope * sx) / count + stamps[seg_start]
+        for start in range(seg_start, seg_stop, block_size):
+            stop = min(start + block_size, seg_stop)
+            stamps[start:stop] = intercept + slope * np.arange(start - seg_start, stop - seg_start)
+    stamps.flush()
+
+
+def stream_xdf(file_path, out_dir, block_size=65536, stream_types=None):
+    """
+    Load an XDF file chunk by chunk into .npy files in out_dir, so peak memory is
+    bounded by block_size samples per stream instead of by the file size.
+    Numeric streams are written to preallocated stream<id>_time_series.npy and
+    stream<id>_time_stamps.npy files and returned memory-mapped. String streams
+    (markers) are small and kept in memory. Timestamps are clock-corrected and
+    dejittered like pyxdf does by default, but without clock reset handling.
+    stream_types: only load streams of these types, e.g. ('Markers', 'EEG')
+    Returns: list of streams shaped like pyxdf's, with 'info', 'time_series'
+             and 'time_stamps'
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    headers = scan_xdf(file_path)
+    if stream_types is not None:
+        headers = {sid: h for sid, h in headers.items() if h['type'] in stream_types}
+
+    writers = {}
+    strings = {}
+    clock = {sid: ([], []) for sid in headers}
+    for sid, header in headers.items():
+        prefix = os.path.join(out_dir, f"stream{sid}")
+        if header['channel_format'] == 'string':
+            strings[sid] = ([], [])
+            continue
+        writers[sid] = (
+            _BlockWriter(f"{prefix}_time_series.npy", NUMERIC_FORMATS[header['channel_format']],
+                         (header['n_samples'], header['channel_count']), block_size),
+            _BlockWriter(f"{prefix}_time_stamps.npy", '<f8', (header['n_samples'],), block_size))
+
+    for tag, sid, a, b in iter_sample_chunks(file_path, headers):
+        if tag == CLOCK_OFFSET:
+            clock[sid][0].append(a)
+            clock[sid][1].append(b)
+        elif sid in strings:
+            strings[sid][0].extend(a)
+            strings[sid][1].append(b)
+        else:
+            writers[sid][0].append(a)
+            writers[sid][1].append(b)
+
+    streams = []
+    for sid, header in headers.items():
+        info = {
+            'name': [header['name']],
+            'type': [header['type']],
+            'channel_count': [str(header['channel_count'])],
+            'channel_format': [header['channel_format']],
+            'nominal_srate': [str(header['nominal_srate'])],
+            'source_id': [header['source_id']],
+            'stream_id': sid,
+        }
+        clock_times, clock_values = np.array(clock[sid][0]), np.array(clock[sid][1])
+        if sid in strings:
+            values, stamps = strings[sid]
+            stamps = np.concatenate(stamps) if stamps else np.empty(0)
+            streams.append({
+                'info': info,
+                'time_series': values,
+                'time_stamps': clock_correction(stamps, clock_times, clock_values),
+            })
+            continue
+        for writer in writers[sid]:
+            writer.close()
+        prefix = os.path.join(out_dir, f"stream{sid}")
+        _fix_timestamps(f"{prefix}_time_stamps.npy", clock_times, clock_values,
+                        header['nominal_srate'], block_size)
+        streams.append({
+            'info': info,
+            'time_series': np.load(f"{prefix}_time_series.npy", mmap_mode='r'),
+            'time_stamps': np.load(f"{prefix}_time_stamps.npy", mmap_mode='r'),
+        })
+    return streams
+
+
+def _pack_varlen_int(n):
+    for nbytes, fmt in [(1, '<B'), (4, '<I'), (8, '<Q')]:
+        if n < 256 ** nbytes:
+            return struct.pack('<B', nbytes) + struct.pack(fmt, n)
+
+
+class XDFWriter:
+    """
+    Minimal XDF writer, the counterpart of the readers above.
+    Every sample is written with its timestamp, as LabRecorder does.
+
+        with XDFWriter('rec.xdf') as writer:
+            writer.add_stream(1, 'obci_eeg1', 'EEG', 16, 'float32', 125)
+            writer.write_samples(1, values, timestamps)
+            writer.write_clock_offset(1, collection_time, offset)
+    """
+
+    def __init__(self, file_path, buffering=-1):
+        self.file = open(file_path, 'wb', buffering=buffering)
+        self.streams = {}
+        self.file.write(b'XDF:')
+        self._write_chunk(FILE_HEADER, b'<?xml version="1.0"?><info><version>1.0</version></info>')
+
+    def _write_chunk(self, tag, content, stream_id=None):
+        body = struct.pack('<H', tag)
+        if stream_id is not None:
+            body += struct.pack('<I', stream_id)
+        self.file.write(_pack_varlen_int(len(body) + len(content)) + body)
+        self.file.write(content)
+
+    def add_stream(self, stream_id, name, stream_type, channel_count, channel_format,
+                   nominal_srate, source_id='', desc=''):
+        info = ET.Element('info')
+        for field, value in [('name', name), ('type', stream_type),
+                             ('channel_count', channel_count),
+                             ('nominal_srate', nominal_srate),
+                             ('channel_format', channel_format),
+                             ('source_id', source_id)]:
+            ET.SubElement(info, field).text = str(value)
+        xml = ET.tostring(info, encoding='unicode').replace('</info>', f'{desc}</info>')
+        self.add_stream_xml(stream_id, f'<?xml version="1.0"?>{xml}')
+
+    def add_stream_xml(self, stream_id, xml):
+        """Add a stream from a complete <info> header, such as pylsl's StreamInfo.as_xml()"""
+        xml = xml.encode('utf-8')
+        header = parse_stream_header(xml)
+        self._write_chunk(STREAM_HEADER, xml, stream_id)
+        self.streams[stream_id] = {
+            'channel_count': header['channel_count'], 'channel_format': header['channel_format'],
+            'first_timestamp': None, 'last_timestamp': None, 'sample_count': 0}
+
+    def write_samples(self, stream_id, values, timestamps):
+        """values: (n_samples, channel_count) array, or list of lists of str for string streams"""
+        stream = self.streams[stream_id]
+        timestamps = np.asarray(timestamps, dtype='<f8')
+        n_samples = len(timestamps)
+        if n_samples == 0:
+            return
+        if stream['channel_format'] == 'string':
+            parts = [_pack_varlen_int(n_samples)]
+            for sample, ts in zip(values, timestamps):
+                parts.append(b'\x08' + ts.tobytes())
+                for value in sample:
+                    encoded = value.encode('utf-8')
+                    parts.append(_pack_varlen_int(len(encoded)) + encoded)
+            content = b''.join(parts)
+        else:
+            dtype = np.dtype(NUMERIC_FORMATS[stream['channel_format']])
+            record = np.dtype([('flag', 'u1'), ('ts', '<f8'),
+                               ('values', dtype, (stream['channel_count'],))])
+            records = np.empty(n_samples, record)
+            records['flag'] = 8
+            records['ts'] = timestamps
+            records['values'] = np.asarray(values).reshape(n_samples, stream['channel_count'])
+            content = _pack_varlen_int(n_samples) + records.tobytes()
+        self._write_chunk(SAMPLES, content, stream_id)
+        if stream['first_timestamp'] is None:
+            stream['first_timestamp'] = timestamps[0]
+        stream['last_timestamp'] = timestamps[-1]
+        stream['sample_count'] += n_samples
+
+    def write_clock_offset(self, stream_id, collection_time, offset):
+        self._write_chunk(CLOCK_OFFSET, struct.pack('<dd', collection_time, offset), stream_id)
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        """Write the stream footers and close the file"""
+        if self.file.closed:
+            return
+        for stream_id, stream in self.streams.items():
+            footer = (f'<?xml version="1.0"?><info>'
+                      f'<first_timestamp>{stream["first_timestamp"] or 0}</first_timestamp>'
+                      f'<last_timestamp>{stream["last_timestamp"] or 0}</last_timestamp>'
+                      f'<sample_count>{stream["sample_count"]}</sample_count></info>')
+            self._write_chunk(STREAM_FOOTER, footer.encode('utf-8'), stream_id)
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()